@@ -2,38 +2,50 @@
 import requests
 import pandas as pd
 import os
+from checkpoint import DEFAULT_CHECKPOINT_EVERY, open_checkpoint, run_checkpointed
 
 print("....................Populating missing CAS Numbers")
 
+def raise_for_transient_error(response):
+    """Raises for rate limiting and server errors, so they are not mistaken for 'not found'."""
+    if response.status_code == 429 or response.status_code >= 500:
+        response.raise_for_status()
+
+def lookup_cas_number(chemical_name):
+    """Fetch CAS number from PubChem API using a chemical name, raising on request errors."""
+    # Construct the primary search URL for PubChem
+    search_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{chemical_name}/xrefs/RegistryID/JSON"
+    response = requests.get(search_url)
+    raise_for_transient_error(response)
+
+    if response.status_code == 200:
+        # Extract CAS Number from response content
+        response_data = response.json()
+        # Locate the CAS Number in the JSON response
+        registry_ids = response_data.get("InformationList", {}).get("Information", [])
+        for entry in registry_ids:
+            if "CAS" in entry.get("RegistryID", ""):
+                return entry["RegistryID"]  # Return CAS Number immediately if found
+
+    # If the first URL does not return a result, try the fallback URL
+    fallback_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/substance/name/{chemical_name}/xrefs/RegistryID/JSON"
+    response = requests.get(fallback_url)
+    raise_for_transient_error(response)
+
+    if response.status_code == 200:
+        # Extract CAS Number from the fallback response
+        response_data = response.json()
+        registry_ids = response_data.get("InformationList", {}).get("Information", [])
+        for entry in registry_ids:
+            if "CAS" in entry.get("RegistryID", ""):
+                return entry["RegistryID"]  # Return CAS Number
+
+    return None  # Return None if no result is found in both URLs
+
 def get_cas_number(chemical_name):
     """Fetch CAS number from PubChem API using a chemical name."""
     try:
-        # Construct the primary search URL for PubChem
-        search_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{chemical_name}/xrefs/RegistryID/JSON"
-        response = requests.get(search_url)
-
-        if response.status_code == 200:
-            # Extract CAS Number from response content
-            response_data = response.json()
-            # Locate the CAS Number in the JSON response
-            registry_ids = response_data.get("InformationList", {}).get("Information", [])
-            for entry in registry_ids:
-                if "CAS" in entry.get("RegistryID", ""):
-                    return entry["RegistryID"]  # Return CAS Number immediately if found
-
-        # If the first URL does not return a result, try the fallback URL
-        fallback_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/substance/name/{chemical_name}/xrefs/RegistryID/JSON"
-        response = requests.get(fallback_url)
-
-        if response.status_code == 200:
-            # Extract CAS Number from the fallback response
-            response_data = response.json()
-            registry_ids = response_data.get("InformationList", {}).get("Information", [])
-            for entry in registry_ids:
-                if "CAS" in entry.get("RegistryID", ""):
-                    return entry["RegistryID"]  # Return CAS Number
-
-        return None  # Return None if no result is found in both URLs
+        return lookup_cas_number(chemical_name)
 
     except Exception as e:
         print(f"Error fetching CAS Number for {chemical_name}: {e}")
@@ -67,16 +79,33 @@ def clean_cas_number(cas_number):
 
     return cas_number
 
-def extract_missing_cas(df_inventory, print_intermediate_steps=False, source_folder=None):
-    """Extract and process missing CAS numbers in the inventory."""
+def extract_missing_cas(df_inventory, print_intermediate_steps=False, source_folder=None,
+                        checkpoint_folder=None, checkpoint_every=DEFAULT_CHECKPOINT_EVERY):
+    """Extract and process missing CAS numbers in the inventory.
+
+    With a checkpoint_folder, looked-up names are checkpointed every checkpoint_every lookups
+    and a rerun only queries the names that were not completed.
+    """
     
     print("....................Extracting and processing missing CAS Numbers")
 
+    checkpoint = open_checkpoint(checkpoint_folder, "cas_lookup", checkpoint_every)
+
+    def checkpointed_cas_number(chemical_name):
+        try:
+            return run_checkpointed(checkpoint, chemical_name, lookup_cas_number, chemical_name)
+        except Exception as e:
+            # Failed lookups are not checkpointed, so a rerun retries them
+            print(f"Error fetching CAS Number for {chemical_name}: {e}")
+            return None
+
     # Identify rows where CAS Number is missing
     missing_cas_mask = df_inventory["CAS Number"].isna() | (df_inventory["CAS Number"] == "") | (df_inventory["CAS Number"] == 0)
     
-    # Apply get_cas_number function only to missing CAS values
-    df_inventory.loc[missing_cas_mask, "CAS Number"] = df_inventory.loc[missing_cas_mask, "Chemical Name"].apply(get_cas_number)
+    # Look up CAS Numbers only for missing CAS values
+    df_inventory.loc[missing_cas_mask, "CAS Number"] = df_inventory.loc[missing_cas_mask, "Chemical Name"].apply(checkpointed_cas_number)
+    if checkpoint is not None:
+        checkpoint.flush()
 
     # Separate proprietary/unidentified chemicals (still missing CAS numbers)
     df_proprietaryRxs_andOther = df_inventory[df_inventory["CAS Number"].isna() | (df_inventory["CAS Number"] == "")]
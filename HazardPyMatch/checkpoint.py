@@ -0,0 +1,94 @@
+# checkpoint.py
+
+import os
+import glob
+import json
+import pandas as pd
+
+DEFAULT_CHECKPOINT_EVERY = 25
+
+
+class StageCheckpoint:
+    """Entity -> result checkpoint for one pipeline stage, stored as a Parquet file.
+
+    Results are buffered in memory and written every `every` new entities. Each write goes to a
+    temporary file that atomically replaces the previous checkpoint, so an interrupted write never
+    leaves a corrupt file behind. Results are stored as JSON text so any lookup result fits.
+    """
+
+    def __init__(self, checkpoint_folder, stage, every=DEFAULT_CHECKPOINT_EVERY):
+        os.makedirs(checkpoint_folder, exist_ok=True)
+        self.stage = stage
+        self.every = max(1, int(every))
+        self.path = os.path.join(checkpoint_folder, f"{stage}.parquet")
+        self.results = {}
+        self.pending = 0
+
+        if os.path.exists(self.path):
+            df = pd.read_parquet(self.path)
+            self.results = {key: json.loads(value) for key, value in zip(df['Key'], df['Value'])}
+            print(f"♻️ Resuming {stage}: {len(self.results)} entities already checkpointed in {self.path}")
+
+    def __contains__(self, key):
+        return str(key) in self.results
+
+    def __len__(self):
+        return len(self.results)
+
+    def get(self, key):
+        return self.results[str(key)]
+
+    def record(self, key, result):
+        """Stores a result and writes the checkpoint once `every` new results have accumulated."""
+        self.results[str(key)] = result
+        self.pending += 1
+        if self.pending >= self.every:
+            self.flush()
+
+    def flush(self):
+        """Atomically rewrites the checkpoint file with all results recorded so far."""
+        if not self.pending and os.path.exists(self.path):
+            return
+
+        df = pd.DataFrame({
+            'Key': list(self.results),
+            'Value': [json.dumps(value, default=str) for value in self.results.values()],
+        })
+        tmp_path = f"{self.path}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.pending = 0
+
+
+def open_checkpoint(checkpoint_folder, stage, every=DEFAULT_CHECKPOINT_EVERY):
+    """Returns a StageCheckpoint, or None when checkpointing is disabled (no folder given)."""
+    return StageCheckpoint(checkpoint_folder, stage, every) if checkpoint_folder else None
+
+
+def clear_checkpoints(checkpoint_folder):
+    """Removes all stage checkpoints (and the folder, once empty) after a successful run."""
+    if not checkpoint_folder or not os.path.isdir(checkpoint_folder):
+        return
+    for path in glob.glob(os.path.join(checkpoint_folder, '*.parquet')) + \
+            glob.glob(os.path.join(checkpoint_folder, '*.parquet.tmp')):
+        os.remove(path)
+    if not os.listdir(checkpoint_folder):
+        os.rmdir(checkpoint_folder)
+
+
+def run_checkpointed(checkpoint, key, func, *args, keep_result=None):
+    """Returns the checkpointed result for key, or calls func(*args) and checkpoints its result.
+
+    Results for which keep_result(result) is False (e.g. error placeholders) are returned but not
+    checkpointed, so a rerun retries them. Exceptions propagate and are never checkpointed.
+    """
+    if checkpoint is not None and key in checkpoint:
+        return checkpoint.get(key)
+
+    result = func(*args)
+
+    if checkpoint is not None and (keep_result is None or keep_result(result)):
+        checkpoint.record(key, result)
+    return result
@@ -4,6 +4,10 @@ import pandas as pd
 import re
 import os
 
+def extract_ghs_codes(ghs_codes):
+    """Extracts all H### codes from a GHS Codes cell."""
+    return re.findall(r'H\d{3}[A-Z]*', str(ghs_codes)) if pd.notna(ghs_codes) else []
+
 def filter_ghs_codes(df_inventory, relevant_ghs_codes, print_intermediate_steps=False, source_folder=None):
     """Filters chemical inventory into relevant and irrelevant GHS codes."""
 
@@ -13,13 +17,8 @@ def filter_ghs_codes(df_inventory, relevant_ghs_codes, print_intermediate_steps=
     if "GHS Codes" not in df_inventory.columns:
         raise KeyError("The DataFrame must contain a 'GHS Codes' column.")
 
-    # Define regex pattern for H-codes
-    pattern = r'H\d{3}[A-Z]*'
-
     # Extract all H### codes from GHS Codes cell
-    df_inventory["Extracted GHS"] = df_inventory["GHS Codes"].apply(
-        lambda x: re.findall(pattern, str(x)) if pd.notna(x) else []
-    )
+    df_inventory["Extracted GHS"] = df_inventory["GHS Codes"].apply(extract_ghs_codes)
 
     # Determine relevance using vectorized filtering
     relevant_mask = df_inventory["Extracted GHS"].apply(lambda codes: any(code in relevant_ghs_codes for code in codes))
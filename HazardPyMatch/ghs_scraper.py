@@ -7,6 +7,8 @@ import re
 import os
 from bs4 import BeautifulSoup
 from thermo.chemical import Chemical
+from checkpoint import DEFAULT_CHECKPOINT_EVERY, open_checkpoint, run_checkpointed
+from cas_lookup import raise_for_transient_error
 
 print("....................Fetching GHS Hazard Codes and Precautionary Statements")
 
@@ -40,67 +42,84 @@ def scrape_precautionary_statements():
         print(f"Error scraping precautionary statements: {e}")
         return pd.DataFrame(columns=['P Codes', 'Precautionary Statements'])
 
-def fetch_pubchem_id(cas_number, df_inventory):
-    """Attempts to find the PubChem ID (CID) for a given CAS number."""
+def lookup_pubchem_id(cas_number, df_inventory=None):
+    """Finds the PubChem ID (CID) for a CAS number (recorded in df_inventory if given).
+
+    Returns None when PubChem has no CID; rate limiting, server and connection errors raise.
+    """
 
     try:
         # Attempt to find PubChem ID using thermo.chemical.Chemical
         chem = Chemical(str(cas_number))
         if chem.PubChem:
             return chem.PubChem
-        else:
-            raise ValueError("No PubChem ID found via thermo.chemical.Chemical")
-
     except Exception:
         pass  # Continue to API lookup if thermo lookup fails
 
-    try:
-        # First attempt: Use PubChem Compound API
-        compound_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{cas_number}/cids/JSON"
-        response = requests.get(compound_url)
-        response.raise_for_status()  # Raise an error for HTTP issues
+    # First attempt: Use PubChem Compound API
+    compound_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{cas_number}/cids/JSON"
+    response = requests.get(compound_url)
+    raise_for_transient_error(response)
 
-        # Parse JSON response for compound
+    if response.status_code == 200:
         data = response.json()
         if 'IdentifierList' in data and 'CID' in data['IdentifierList']:
             cid = data['IdentifierList']['CID'][0]  # Get the first CID
-            df_inventory.loc[df_inventory['CAS Number'] == cas_number, 'PubChem ID'] = cid
-            print(f"✅ CID {cid} added to 'PubChem ID' for CAS: {cas_number}")  
+            if df_inventory is not None:
+                df_inventory.loc[df_inventory['CAS Number'] == cas_number, 'PubChem ID'] = cid
+            print(f"✅ CID {cid} added to 'PubChem ID' for CAS: {cas_number}")
             return cid
-        else:
-            raise ValueError("No CID found in Compound API response")
 
+    # Fallback: Use PubChem Substance API
+    substance_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/substance/name/{cas_number}/cids/JSON"
+    response = requests.get(substance_url)
+    raise_for_transient_error(response)
+
+    if response.status_code == 200:
+        data = response.json()
+        if 'InformationList' in data and 'Information' in data['InformationList']:
+            # Extract CID from the first match in the substance response
+            cids = [
+                cid
+                for info in data['InformationList']['Information']
+                if 'CID' in info
+                for cid in info['CID']
+            ]
+            if cids:
+                if df_inventory is not None:
+                    df_inventory.loc[df_inventory['CAS Number'] == cas_number, 'PubChem ID'] = cids[0]
+                print(f"CID {cids[0]} added to 'PubChem ID' using substance database for CAS: {cas_number}")
+                return cids[0]
+
+    return None  # Return None if no CID found
+
+def fetch_pubchem_id(cas_number, df_inventory=None):
+    """Attempts to find the PubChem ID (CID) for a given CAS number (recorded in df_inventory if given)."""
+    try:
+        return lookup_pubchem_id(cas_number, df_inventory)
     except Exception:
-        try:
-            # Fallback: Use PubChem Substance API
-            substance_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/substance/name/{cas_number}/cids/JSON"
-            response = requests.get(substance_url)
-            response.raise_for_status()  # Raise an error for HTTP issues
+        return None  # Fail silently for unhandled errors
 
-            # Parse JSON response for substance
-            data = response.json()
+def fetch_ghs_codes_for_cid(chem_id):
+    """Fetches the GHS H-codes for a PubChem compound ID as a ' --- ' joined string (None if no GHS data).
 
-            if 'InformationList' in data and 'Information' in data['InformationList']:
-                # Extract CID from the first match in the substance response
-                cids = [
-                    cid
-                    for info in data['InformationList']['Information']
-                    if 'CID' in info
-                    for cid in info['CID']
-                ]
-                if cids:
-                    df_inventory.loc[df_inventory['CAS Number'] == cas_number, 'PubChem ID'] = cids[0]
-                    print(f"CID {cids[0]} added to 'PubChem ID' using substance database for CAS: {cas_number}")  
-                    return cids[0]
-                else:
-                    raise ValueError("No CID found in Substance API response")
-            else:
-                raise ValueError("No information found in Substance API response")
+    Rate limiting and server errors raise instead of returning None, so they are never recorded as 'no GHS data'.
+    Only the 4-character base code is kept: H360FD and H360Fd are both stored as H360.
+    """
+    result = requests.get(
+        f'https://pubchem.ncbi.nlm.nih.gov/rest/pug_view/data/compound/{int(chem_id)}/JSON/?response_type=display&heading=GHS%20Classification',
+        'lxml'
+    )
+    raise_for_transient_error(result)
+    soup = BeautifulSoup(result.text, 'lxml').text
 
-        except Exception:
-            pass  # Fail silently for unhandled errors
+    if len(soup) <= 90:
+        return None
 
-    return None  # Return None if no CID found
+    # Extract GHS H-codes (base code only, category letters such as the FD in H360FD are dropped)
+    pattern_hits = [m.start() for m in re.finditer(r'"H\d\d\d', soup)]
+    ghs_codes_set = {soup[ph+1:ph+5] for ph in pattern_hits}
+    return ' --- '.join(sorted(ghs_codes_set))
 
 # Function to fetch GHS codes from PubChem API if this didn't work with compounds and Pubchem ID (most likely the chemical name is missing a PubchemID)
 def fetch_ghs_code(chemical_name):
@@ -120,8 +139,13 @@ def fetch_ghs_code(chemical_name):
     except Exception as e:
         return f"Error: {e}"
 
-def update_ghs_codes(df_inventory, print_intermediate_steps=False, source_folder=None):
-    """Fetches and updates GHS hazard classifications based on PubChem IDs or chemical names."""
+def update_ghs_codes(df_inventory, print_intermediate_steps=False, source_folder=None,
+                     checkpoint_folder=None, checkpoint_every=DEFAULT_CHECKPOINT_EVERY):
+    """Fetches and updates GHS hazard classifications based on PubChem IDs or chemical names.
+
+    With a checkpoint_folder, fetched GHS codes are checkpointed every checkpoint_every lookups
+    and a rerun only queries the PubChem IDs and names that were not completed.
+    """
 
     # Scrape precautionary statements
     df_precaution = scrape_precautionary_statements()
@@ -131,20 +155,15 @@ def update_ghs_codes(df_inventory, print_intermediate_steps=False, source_folder
     df_inventory['GHS Codes'] = np.nan
     df_inventory['Precautionary Statements'] = np.nan
 
+    id_checkpoint = open_checkpoint(checkpoint_folder, "ghs_by_pubchem_id", checkpoint_every)
+    name_checkpoint = open_checkpoint(checkpoint_folder, "ghs_by_name", checkpoint_every)
+
     # Lookup GHS classifications using PubChem IDs
     for chem_id in set(df_inventory['PubChem ID'].dropna()):
         try:
-            result = requests.get(
-                f'https://pubchem.ncbi.nlm.nih.gov/rest/pug_view/data/compound/{int(chem_id)}/JSON/?response_type=display&heading=GHS%20Classification',
-                'lxml'
-            )
-            soup = BeautifulSoup(result.text, 'lxml').text
-
-            if len(soup) > 90:
-                # Extract GHS H-codes
-                pattern_hits = [m.start() for m in re.finditer(r'"H\d\d\d', soup)]
-                ghs_codes_set = {soup[ph+1:ph+5] for ph in pattern_hits}
-                df_inventory.loc[df_inventory['PubChem ID'] == chem_id, 'GHS Codes'] = ' --- '.join(sorted(ghs_codes_set))
+            ghs_codes = run_checkpointed(id_checkpoint, int(chem_id), fetch_ghs_codes_for_cid, chem_id)
+            if ghs_codes is not None:
+                df_inventory.loc[df_inventory['PubChem ID'] == chem_id, 'GHS Codes'] = ghs_codes
 
         except Exception as e:
             print(f"⚠️ Error retrieving GHS data for PubChem ID {chem_id}: {e}")
@@ -153,9 +172,15 @@ def update_ghs_codes(df_inventory, print_intermediate_steps=False, source_folder
     for index, row in df_inventory.iterrows():
         if not row["GHS Codes"]:
             chemical_name = row["Chemical Name"]
-            ghs_code = fetch_ghs_code(chemical_name)
+            # Error messages are returned as values; leave them out of the checkpoint so a rerun retries
+            ghs_code = run_checkpointed(name_checkpoint, chemical_name, fetch_ghs_code, chemical_name,
+                                        keep_result=lambda result: not str(result).startswith("Error"))
             df_inventory.at[index, "GHS Codes"] = ghs_code
 
+    for checkpoint in (id_checkpoint, name_checkpoint):
+        if checkpoint is not None:
+            checkpoint.flush()
+
     # Save updated inventory if print_intermediate_steps is enabled
     if print_intermediate_steps and source_folder:
         output_path = os.path.join(source_folder, "df_inventory_withGHScodes.xlsx")
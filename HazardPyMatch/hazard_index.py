@@ -0,0 +1,191 @@
+# hazard_index.py
+
+import os
+import numpy as np
+import pandas as pd
+from ghs_filter import extract_ghs_codes
+
+HAZARD_INDEX_FOLDER = "hazard_index"
+
+
+class HazardIndex:
+    """Sparse protocol x CAS incidence matrix with a per-CAS hazard summary.
+
+    - protocols: protocol_id, Filename, Protocol, Source
+    - cas_summary: cas_id, CAS Number, PubChem ID, H-Code Count and one uint8 column per H-code
+      (1 if the chemical carries that code); combined codes are split into their parts, so an
+      H360FD chemical has H360, H360F and H360D set
+    - protocol_ids / cas_ids: int32 coordinate arrays, one pair per (protocol, matched CAS)
+
+    Everything is stored as Parquet, so questions such as "which protocols involve H360 chemicals?"
+    are answered with array operations instead of re-parsing comma-joined strings.
+    """
+
+    def __init__(self, protocols, cas_summary, protocol_ids, cas_ids):
+        self.protocols = protocols
+        self.cas_summary = cas_summary
+        self.protocol_ids = np.asarray(protocol_ids, dtype=np.int32)
+        self.cas_ids = np.asarray(cas_ids, dtype=np.int32)
+        self._cas_lookup = {cas: i for i, cas in enumerate(cas_summary['CAS Number'])}
+        self._filename_lookup = {filename: i for i, filename in enumerate(protocols['Filename'])}
+
+    @classmethod
+    def build(cls, df_inventory, results):
+        """Builds the index from the inventory and (filename, hazard_row, matched_details) results."""
+        print("....................Building Protocol x CAS Hazard Index")
+
+        # One summary row per CAS Number, in inventory order
+        df_cas = df_inventory[['CAS Number', 'PubChem ID', 'GHS Codes']].copy()
+        df_cas['CAS Number'] = df_cas['CAS Number'].astype(str)
+        df_cas = df_cas.drop_duplicates(subset='CAS Number', keep='first')
+
+        # Chemicals matched in protocols but absent from the inventory still get a row
+        known = set(df_cas['CAS Number'])
+        extra_rows = []
+        for _, _, matched_details in results:
+            for detail in matched_details:
+                cas_number = str(detail['CAS Number'])
+                if cas_number not in known:
+                    known.add(cas_number)
+                    extra_rows.append({'CAS Number': cas_number, 'PubChem ID': detail['PubChem_ID'],
+                                       'GHS Codes': detail['GHS_Codes']})
+        if extra_rows:
+            df_cas = pd.concat([df_cas, pd.DataFrame(extra_rows)], ignore_index=True)
+
+        cas_summary = hazard_code_table(df_cas.reset_index(drop=True))
+
+        # Protocols in filename order; protocols without matches keep a row with no incidence entries
+        results = sorted(results, key=lambda result: result[0])
+        protocols = pd.DataFrame(
+            [(i, filename, hazard_row[0], hazard_row[1]) for i, (filename, hazard_row, _) in enumerate(results)],
+            columns=['protocol_id', 'Filename', 'Protocol', 'Source'],
+        )
+
+        cas_lookup = {cas: i for i, cas in enumerate(cas_summary['CAS Number'])}
+        protocol_ids, cas_ids = [], []
+        for protocol_id, (_, _, matched_details) in enumerate(results):
+            for cas_id in sorted({cas_lookup[str(detail['CAS Number'])] for detail in matched_details}):
+                protocol_ids.append(protocol_id)
+                cas_ids.append(cas_id)
+
+        return cls(protocols, cas_summary, protocol_ids, cas_ids)
+
+    @property
+    def h_codes(self):
+        """The H-codes that have an indicator column in cas_summary."""
+        return [column for column in self.cas_summary.columns if column.startswith('H') and column != 'H-Code Count']
+
+    def save(self, folder):
+        """Saves the protocols, CAS summary and incidence coordinates as Parquet files in folder."""
+        os.makedirs(folder, exist_ok=True)
+        self.protocols.to_parquet(os.path.join(folder, "protocols.parquet"), index=False)
+        self.cas_summary.to_parquet(os.path.join(folder, "cas_hazard_summary.parquet"), index=False)
+        pd.DataFrame({'protocol_id': self.protocol_ids, 'cas_id': self.cas_ids}).to_parquet(
+            os.path.join(folder, "protocol_cas_matrix.parquet"), index=False
+        )
+        return folder
+
+    @classmethod
+    def load(cls, folder):
+        matrix = pd.read_parquet(os.path.join(folder, "protocol_cas_matrix.parquet"))
+        return cls(
+            pd.read_parquet(os.path.join(folder, "protocols.parquet")),
+            pd.read_parquet(os.path.join(folder, "cas_hazard_summary.parquet")),
+            matrix['protocol_id'].to_numpy(),
+            matrix['cas_id'].to_numpy(),
+        )
+
+    def _cas_mask(self, h_codes=None):
+        """Boolean mask over cas_id for chemicals carrying any of h_codes (all chemicals if None).
+
+        "H360" covers every H360 sub-category, "H360D" covers H360D and H360FD, and a combined
+        code such as "H360FD" requires all of its parts.
+        """
+        if h_codes is None:
+            return np.ones(len(self.cas_summary), dtype=bool)
+        if isinstance(h_codes, str):
+            h_codes = [h_codes]
+        mask = np.zeros(len(self.cas_summary), dtype=bool)
+        for code in h_codes:
+            code_mask = np.ones(len(self.cas_summary), dtype=bool)
+            for part in hcode_parts(code.strip().upper()):
+                if part not in self.cas_summary.columns:
+                    code_mask[:] = False
+                    break
+                code_mask &= self.cas_summary[part].to_numpy() == 1
+            mask |= code_mask
+        return mask
+
+    def hazard_counts(self, h_codes=None):
+        """Number of matched chemicals per protocol, counting only chemicals with any of h_codes if given."""
+        entry_mask = self._cas_mask(h_codes)[self.cas_ids]
+        counts = np.bincount(self.protocol_ids[entry_mask], minlength=len(self.protocols))
+        return self.protocols.assign(**{'Hazard Count': counts})
+
+    def protocols_with_hcode(self, h_codes):
+        """Protocols that involve at least one chemical carrying any of the given H-codes."""
+        counts = self.hazard_counts(h_codes)
+        return counts[counts['Hazard Count'] > 0].reset_index(drop=True)
+
+    def top_protocols(self, n=10, h_codes=None):
+        """The n protocols with the most matched (optionally H-code filtered) chemicals."""
+        counts = self.hazard_counts(h_codes)
+        return counts.sort_values(['Hazard Count', 'Filename'], ascending=[False, True]).head(n).reset_index(drop=True)
+
+    def chemicals_in_protocol(self, filename):
+        """Hazard summary rows of the chemicals matched in one protocol (empty for an unknown filename)."""
+        protocol_id = self._filename_lookup.get(filename)
+        if protocol_id is None:
+            return self.cas_summary.iloc[0:0]
+        return self.cas_summary.iloc[self.cas_ids[self.protocol_ids == protocol_id]].reset_index(drop=True)
+
+    def protocols_for_cas(self, cas_number):
+        """Protocols in which a CAS Number was matched."""
+        cas_id = self._cas_lookup.get(str(cas_number))
+        if cas_id is None:
+            return self.protocols.iloc[0:0]
+        return self.protocols.iloc[self.protocol_ids[self.cas_ids == cas_id]].reset_index(drop=True)
+
+    def hcode_protocol_counts(self):
+        """Number of protocols involving at least one chemical with each H-code."""
+        h_codes = self.h_codes
+        incidence = np.zeros((len(self.protocols), len(h_codes)), dtype=bool)
+        if len(self.cas_ids):
+            cas_codes = self.cas_summary[h_codes].to_numpy(dtype=bool)
+            np.logical_or.at(incidence, self.protocol_ids, cas_codes[self.cas_ids])
+        return pd.Series(incidence.sum(axis=0), index=h_codes, name='Protocols').sort_values(ascending=False)
+
+
+def hcode_parts(code):
+    """Splits a combined H-code into its most specific parts: H360FD -> [H360F, H360D], H360 -> [H360]."""
+    base, letters = code[:4], code[4:]
+    return [base + letter for letter in dict.fromkeys(letters)] or [base]
+
+
+def expand_hcode(code):
+    """The indicator columns set by an H-code: its base code plus one per category letter."""
+    return [code[:4]] + [part for part in hcode_parts(code) if part != code[:4]]
+
+
+def hazard_code_table(df_cas):
+    """Adds cas_id, H-Code Count and one uint8 indicator column per (expanded) H-code to a CAS table.
+
+    H-Code Count is the number of distinct codes the chemical is classified with.
+    """
+    parsed = df_cas['GHS Codes'].apply(extract_ghs_codes)
+    expanded = [{part for code in codes for part in expand_hcode(code)} for codes in parsed]
+    h_codes = sorted({part for parts in expanded for part in parts})
+    code_index = {code: i for i, code in enumerate(h_codes)}
+
+    indicators = np.zeros((len(df_cas), len(h_codes)), dtype=np.uint8)
+    for row, parts in enumerate(expanded):
+        for part in parts:
+            indicators[row, code_index[part]] = 1
+
+    cas_summary = pd.DataFrame({
+        'cas_id': np.arange(len(df_cas), dtype=np.int32),
+        'CAS Number': df_cas['CAS Number'].astype(str).to_numpy(),
+        'PubChem ID': pd.to_numeric(df_cas['PubChem ID'], errors='coerce').to_numpy(),
+        'H-Code Count': np.array([len(set(codes)) for codes in parsed], dtype=np.int16),
+    })
+    return pd.concat([cas_summary, pd.DataFrame(indicators, columns=h_codes)], axis=1)
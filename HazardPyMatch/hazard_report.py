@@ -0,0 +1,103 @@
+# hazard_report.py
+
+import os
+import base64
+import html
+from visualization import DEFAULT_TOP_N, aggregate_top_n, ghs_code_counts, protocol_counts, cas_counts, render_plots
+
+
+def write_summary_csvs(df_inventory, df_hazards=None, source_folder=None):
+    """Saves the full (non-truncated) count tables behind the report plots as CSV files."""
+
+    summaries = {
+        "GHS_Code_Counts.csv": ghs_code_counts(df_inventory).rename_axis("GHS Code").reset_index(name="Frequency"),
+        "CAS_Number_Counts.csv": cas_counts(df_inventory).rename_axis("CAS Number").reset_index(name="Occurrences"),
+    }
+    if df_hazards is not None:
+        summaries["Protocol_Hazard_Counts.csv"] = (
+            protocol_counts(df_hazards).rename_axis("Protocol").reset_index(name="Hazardous Instances")
+        )
+
+    output_paths = []
+    for filename, df in summaries.items():
+        output_path = os.path.join(source_folder, filename)
+        df.to_csv(output_path, index=False)
+        output_paths.append(output_path)
+        print(f"Summary table saved to: {output_path}")
+
+    return output_paths
+
+
+def _embed_png(path):
+    """Returns an <img> tag with the PNG at path inlined as base64 data."""
+    with open(path, "rb") as f:
+        encoded = base64.b64encode(f.read()).decode("ascii")
+    alt = html.escape(os.path.splitext(os.path.basename(path))[0].replace("_", " "))
+    return f'<img alt="{alt}" src="data:image/png;base64,{encoded}">'
+
+
+def _counts_table(counts, label, value_label, top_n):
+    """Formats a top-N count table as HTML."""
+    df = aggregate_top_n(counts, top_n).rename_axis(label).reset_index(name=value_label)
+    return df.to_html(index=False, border=0, classes="summary")
+
+
+def write_html_report(df_inventory, df_hazards=None, source_folder=None, plot_paths=(), top_n=DEFAULT_TOP_N):
+    """Writes a single self-contained HTML report with inlined plots and top-N summary tables."""
+
+    sections = [
+        "<h2>Overview</h2>",
+        "<ul>",
+        f"<li>Chemicals in inventory: {len(df_inventory)}</li>",
+        f"<li>Unique CAS Numbers: {df_inventory['CAS Number'].nunique()}</li>",
+    ]
+    if df_hazards is not None:
+        hazardous = (df_hazards["Hazards"] != "N/A").sum() if "Hazards" in df_hazards.columns else len(df_hazards)
+        sections.append(f"<li>Protocols scanned: {len(df_hazards)} ({hazardous} with matched hazards)</li>")
+    sections.append("</ul>")
+
+    sections.append("<h2>Plots</h2>")
+    sections.extend(_embed_png(path) for path in plot_paths)
+
+    sections.append(f"<h2>GHS Hazard Codes (top {top_n})</h2>")
+    sections.append(_counts_table(ghs_code_counts(df_inventory), "GHS Code", "Frequency", top_n))
+    if df_hazards is not None:
+        sections.append(f"<h2>Hazardous Protocols (top {top_n})</h2>")
+        sections.append(_counts_table(protocol_counts(df_hazards), "Protocol", "Hazardous Instances", top_n))
+    sections.append(f"<h2>CAS Numbers (top {top_n})</h2>")
+    sections.append(_counts_table(cas_counts(df_inventory), "CAS Number", "Occurrences", top_n))
+
+    document = (
+        "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        "<title>HazardPyMatch Report</title>\n"
+        "<style>body{font-family:sans-serif;margin:2em;} img{max-width:100%;display:block;margin:1em 0;} "
+        "table.summary{border-collapse:collapse;} table.summary td,table.summary th{padding:2px 8px;"
+        "border-bottom:1px solid #ddd;text-align:left;}</style>\n"
+        "</head>\n<body>\n<h1>HazardPyMatch Report</h1>\n"
+        + "\n".join(sections)
+        + "\n</body>\n</html>\n"
+    )
+
+    output_path = os.path.join(source_folder, "HazardPyMatch_Report.html")
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(document)
+    print(f"HTML report saved to: {output_path}")
+
+    return output_path
+
+
+def generate_hazard_report(df_inventory, df_hazards=None, source_folder=None, top_n=DEFAULT_TOP_N, max_workers=None):
+    """Renders the report plots headlessly in parallel and writes the HTML and CSV summaries."""
+
+    print("....................Generating Hazard Report")
+
+    if not source_folder:
+        raise ValueError("A source_folder is required to write the hazard report.")
+
+    plot_paths = render_plots(df_inventory, df_hazards, source_folder=source_folder, top_n=top_n, max_workers=max_workers)
+    csv_paths = write_summary_csvs(df_inventory, df_hazards, source_folder=source_folder)
+    html_path = write_html_report(df_inventory, df_hazards, source_folder=source_folder, plot_paths=plot_paths, top_n=top_n)
+
+    print("....................Hazard Report Complete")
+
+    return html_path, csv_paths, plot_paths
@@ -0,0 +1,447 @@
+# hazard_service.py (HazardPyMatch resident service)
+
+import io
+import os
+import json
+import time
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+from cas_lookup import lookup_cas_number, clean_cas_number
+from ghs_scraper import lookup_pubchem_id, fetch_ghs_codes_for_cid
+from ghs_filter import extract_ghs_codes
+from synonym_lookup import fetch_synonyms_from_pubchem, SYNONYM_PLACEHOLDERS
+from synonym_quality import DEFAULT_SYNONYM_RULES, prune_master_list, synonym_format_issue
+from protocol_matcher import MATCH_MODES, SynonymMatcher, extract_protocol_text, match_protocol_text
+from master_list import CompactMasterList, MASTER_LIST_FOLDER
+
+ENRICHED_INVENTORY_FILENAME = 'df_inventory_relevantGHScodes_uniquecodes_inlistsyns_ncbisyns.xlsx'
+
+
+class PubChemLookup:
+    """Live PubChem backend, delegating to the pipeline's stage functions.
+
+    Methods return None / [] when PubChem has no data and raise when PubChem could not be reached
+    (connection errors, rate limiting, server errors), so outages are never cached as answers.
+    """
+
+    def cas_for_name(self, chemical_name):
+        return lookup_cas_number(chemical_name)
+
+    def pubchem_id_for_cas(self, cas_number):
+        return lookup_pubchem_id(cas_number)
+
+    def ghs_codes_for_pubchem_id(self, pubchem_id):
+        return fetch_ghs_codes_for_cid(pubchem_id)
+
+    def synonyms_for_cas(self, cas_number):
+        synonyms = fetch_synonyms_from_pubchem(cas_number)[0][1:]
+        if "Error retrieving synonyms" in synonyms:
+            raise ConnectionError(f"PubChem synonym lookup failed for {cas_number}")
+        return [s for s in synonyms if s not in SYNONYM_PLACEHOLDERS]
+
+
+class FakePubChemLookup:
+    """In-memory PubChem backend for local testing.
+
+    records maps CAS Number -> {"names": [...], "pubchem_id": ..., "ghs_codes": "H225 --- H301"}.
+    Every call is counted in self.calls so cache behaviour can be checked, and setting
+    self.unavailable = True makes every call raise, like the live backend during an outage.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self.calls = 0
+        self.unavailable = False
+
+    def _call(self):
+        self.calls += 1
+        if self.unavailable:
+            raise ConnectionError("PubChem unavailable")
+
+    def cas_for_name(self, chemical_name):
+        self._call()
+        for cas_number, record in self.records.items():
+            if chemical_name.lower() in (name.lower() for name in record.get("names", [])):
+                return cas_number
+        return None
+
+    def pubchem_id_for_cas(self, cas_number):
+        self._call()
+        return self.records.get(cas_number, {}).get("pubchem_id")
+
+    def ghs_codes_for_pubchem_id(self, pubchem_id):
+        self._call()
+        for record in self.records.values():
+            if record.get("pubchem_id") == pubchem_id:
+                return record.get("ghs_codes")
+        return None
+
+    def synonyms_for_cas(self, cas_number):
+        self._call()
+        return list(self.records.get(cas_number, {}).get("names", []))
+
+
+class HazardService:
+    """Keeps the enriched inventory, synonym matcher and lookup caches warm between requests."""
+
+    def __init__(self, df_inventory, relevant_ghs_codes, lookup=None, latency_window=10000, master_list=None,
+                 synonym_rules=DEFAULT_SYNONYM_RULES, match_mode="exact"):
+        self.relevant_ghs_codes = set(relevant_ghs_codes)
+        self.lookup = lookup or PubChemLookup()
+        self.synonym_rules = synonym_rules
+
+        # A saved CompactMasterList can be passed instead of the enriched inventory
+        if master_list is None:
+            df_inventory = df_inventory.copy()
+            df_inventory['CAS Number'] = df_inventory['CAS Number'].astype(str)
+            master_list = CompactMasterList.from_inventory(df_inventory)
+
+        # Warm state: CAS -> record index, the compact master list for name lookups over every
+        # synonym, and a synonym matcher over the pruned, high-signal synonyms only
+        self.master_list = master_list
+        self.master_list.find_synonym('')  # Build the name lookup index now rather than on the first request
+        self.cas_index = {}
+        self.name_index = {}  # lowercase name -> CAS numbers, for chemicals added by refresh
+        _, first_entries = np.unique(master_list.row_ids, return_index=True)
+        for i in first_entries.tolist():
+            self.cas_index.setdefault(master_list.cas_number(i), {
+                'pubchem_id': master_list.pubchem_id(i), 'ghs_codes': master_list.ghs_code_string(i),
+            })
+        if synonym_rules is not None:
+            master_list, _, _ = prune_master_list(master_list, synonym_rules)
+        self.matcher = SynonymMatcher(master_list, mode=match_mode)
+
+        # Caches for CAS numbers / names that are not in the inventory
+        self.cas_cache = {}
+        self.name_cache = {}
+
+        self.lookup_errors = 0
+
+        self.lock = threading.RLock()
+        self.latencies = {}
+        self.latency_window = latency_window
+
+    def _index_new_entries(self, entries):
+        for cas_number, synonym, pubchem_id, ghs_codes in entries:
+            self.cas_index.setdefault(cas_number, {'pubchem_id': pubchem_id, 'ghs_codes': ghs_codes})
+            self.name_index.setdefault(str(synonym).lower(), set()).add(cas_number)
+
+    def _hazard_result(self, cas_number, pubchem_id, ghs_codes, in_inventory):
+        codes = extract_ghs_codes(ghs_codes)
+        relevant = sorted(set(codes) & self.relevant_ghs_codes)
+        return {
+            'cas_number': cas_number,
+            'in_inventory': in_inventory,
+            'pubchem_id': None if pd.isna(pubchem_id) else pubchem_id,
+            'ghs_codes': codes,
+            'relevant_ghs_codes': relevant,
+            'hazardous': bool(relevant),
+            'status': 'ok',
+        }
+
+    def _lookup_failed(self, error):
+        with self.lock:
+            self.lookup_errors += 1
+        return {'hazardous': None, 'status': 'unknown', 'error': f"PubChem lookup failed: {error}"}
+
+    def check_cas(self, cas_number):
+        """Checks a single CAS number against the hazard profile."""
+        cas_number = clean_cas_number(cas_number)
+        if not cas_number:
+            raise ValueError("Invalid CAS Number.")
+
+        with self.lock:
+            record = self.cas_index.get(cas_number)
+            if record is not None:
+                return self._hazard_result(cas_number, record['pubchem_id'], record['ghs_codes'], True)
+            if cas_number in self.cas_cache:
+                return self.cas_cache[cas_number]
+
+        # Not in the inventory: fall back to PubChem outside the lock, then cache the answer.
+        # A failed lookup is reported as unknown and not cached, so the next request retries it.
+        try:
+            pubchem_id = self.lookup.pubchem_id_for_cas(cas_number)
+            ghs_codes = self.lookup.ghs_codes_for_pubchem_id(pubchem_id) if pubchem_id is not None else None
+        except Exception as e:
+            return dict(self._lookup_failed(e), cas_number=cas_number, in_inventory=False)
+        result = self._hazard_result(cas_number, pubchem_id, ghs_codes, False)
+
+        with self.lock:
+            self.cas_cache[cas_number] = result
+        return result
+
+    def check_name(self, chemical_name):
+        """Checks a chemical name, resolving it through the inventory synonyms before PubChem."""
+        key = chemical_name.strip().lower()
+        if not key:
+            raise ValueError("Empty chemical name.")
+
+        with self.lock:
+            cas_numbers = {self.master_list.cas_number(i) for i in self.master_list.find_synonym(key)}
+            cas_numbers = sorted(cas_numbers | self.name_index.get(key, set()))
+            if not cas_numbers and key in self.name_cache:
+                cas_numbers = self.name_cache[key]
+
+        if not cas_numbers:
+            try:
+                cas_number = self.lookup.cas_for_name(chemical_name.strip())
+            except Exception as e:
+                return dict(self._lookup_failed(e), name=chemical_name, matches=[])
+            cas_numbers = [cas_number] if cas_number else []
+            with self.lock:
+                self.name_cache[key] = cas_numbers
+
+        results = [self.check_cas(cas_number) for cas_number in cas_numbers]
+
+        # Any hazardous match decides the answer; otherwise a failed lookup leaves it unknown
+        if any(result['hazardous'] for result in results):
+            hazardous = True
+        elif any(result['status'] == 'unknown' for result in results):
+            hazardous = None
+        else:
+            hazardous = False
+        return {
+            'name': chemical_name,
+            'matches': results,
+            'hazardous': hazardous,
+            'status': 'unknown' if hazardous is None else 'ok',
+        }
+
+    def scan_text(self, extracted_text, filename='uploaded.pdf'):
+        """Matches protocol text against the warm synonym matcher."""
+        with self.lock:
+            matcher = self.matcher
+        hazard_row, matched_details = match_protocol_text(filename, extracted_text, matcher)
+        protocol, source, hazards = hazard_row
+        return {
+            'protocol': protocol,
+            'source': source,
+            'hazards': [] if hazards == "N/A" else hazards.split(', '),
+            'matched_details': matched_details,
+        }
+
+    def scan_pdf(self, pdf_bytes, filename='uploaded.pdf'):
+        """Extracts and matches an uploaded protocol PDF."""
+        return self.scan_text(extract_protocol_text(io.BytesIO(pdf_bytes)), filename)
+
+    def refresh(self, chemicals):
+        """Incrementally enriches new chemicals and adds the relevant ones to the warm state.
+
+        chemicals is a list of {"Chemical Name": ..., "CAS Number": ...} records; only CAS numbers
+        not already in the inventory trigger PubChem lookups.
+        """
+        added, skipped, irrelevant, failed = [], [], [], []
+        new_rows = []
+        in_list_names = set()  # Names given in the request are exempt from the length rule
+
+        for chemical in chemicals:
+            chemical_name = chemical.get('Chemical Name')
+            cas_number = clean_cas_number(chemical.get('CAS Number'))
+            try:
+                if not cas_number and chemical_name:
+                    cas_number = clean_cas_number(self.lookup.cas_for_name(chemical_name))
+                if not cas_number:
+                    skipped.append(chemical_name)
+                    continue
+
+                with self.lock:
+                    known = cas_number in self.cas_index
+                if known:
+                    skipped.append(cas_number)
+                    continue
+
+                pubchem_id = self.lookup.pubchem_id_for_cas(cas_number)
+                ghs_codes = self.lookup.ghs_codes_for_pubchem_id(pubchem_id) if pubchem_id is not None else None
+                if not set(extract_ghs_codes(ghs_codes)) & self.relevant_ghs_codes:
+                    irrelevant.append(cas_number)
+                    continue
+
+                pubchem_synonyms = self.lookup.synonyms_for_cas(cas_number)
+            except Exception as e:
+                # Leave the chemical out entirely so a later refresh retries it
+                self._lookup_failed(e)
+                failed.append({'chemical': cas_number or chemical_name, 'error': f"PubChem lookup failed: {e}"})
+                continue
+
+            synonyms = [chemical_name] if chemical_name else []
+            synonyms += pubchem_synonyms
+            if chemical_name:
+                in_list_names.add(chemical_name.strip())
+            synonyms = list(dict.fromkeys(s.strip() for s in synonyms if s and s.strip()))
+            for synonym in synonyms:
+                new_rows.append((cas_number, synonym, pubchem_id, ghs_codes))
+            added.append(cas_number)
+
+        if new_rows:
+            # Apply the same format rules to the new synonyms before they reach the matcher
+            matcher_rows = [
+                row for row in new_rows
+                if self.synonym_rules is None
+                or synonym_format_issue(row[1], self.synonym_rules, in_list=row[1] in in_list_names) is None
+            ]
+            new_master_df = pd.DataFrame(matcher_rows, columns=['CAS_Number', 'Synonym', 'PubChem_ID', 'GHS_Codes'])
+            with self.lock:
+                # Extend a copy so in-flight scans keep using a consistent matcher
+                matcher = self.matcher.copy()
+                matcher.extend(new_master_df)
+                self.matcher = matcher
+                self._index_new_entries(new_rows)
+                for cas_number in added:
+                    self.cas_cache.pop(cas_number, None)
+                self.name_cache.clear()
+
+        return {'added': added, 'already_known': skipped, 'not_relevant': irrelevant, 'failed': failed,
+                'patterns': len(self.matcher.patterns)}
+
+    def record_latency(self, endpoint, seconds):
+        with self.lock:
+            self.latencies.setdefault(endpoint, deque(maxlen=self.latency_window)).append(seconds)
+
+    def stats(self):
+        """Returns inventory size and p50/p99 latencies (ms) per endpoint."""
+        with self.lock:
+            latency_stats = {}
+            for endpoint, samples in self.latencies.items():
+                ordered = sorted(samples)
+                latency_stats[endpoint] = {
+                    'count': len(ordered),
+                    'p50_ms': round(ordered[int(0.50 * (len(ordered) - 1))] * 1000, 3),
+                    'p99_ms': round(ordered[int(0.99 * (len(ordered) - 1))] * 1000, 3),
+                }
+            return {
+                'cas_numbers': len(self.cas_index),
+                'synonym_entries': len(self.matcher),
+                'patterns': len(self.matcher.patterns),
+                'cached_lookups': len(self.cas_cache) + len(self.name_cache),
+                'lookup_errors': self.lookup_errors,
+                'latency': latency_stats,
+            }
+
+
+class HazardRequestHandler(BaseHTTPRequestHandler):
+    """JSON API: GET /check?cas=...|name=..., POST /scan, POST /refresh, GET /stats, GET /health."""
+
+    service = None  # Set by make_server
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def _dispatch(self, handler):
+        endpoint = urlparse(self.path).path
+        start = time.perf_counter()
+        try:
+            status, payload = handler()
+        except ValueError as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            status, payload = 500, {'error': str(e)}
+        self.service.record_latency(endpoint, time.perf_counter() - start)
+        self._send_json(status, payload)
+
+    def do_GET(self):
+        self._dispatch(self._handle_get)
+
+    def do_POST(self):
+        self._dispatch(self._handle_post)
+
+    def _handle_get(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == '/health':
+            return 200, {'status': 'ok'}
+        if url.path == '/stats':
+            return 200, self.service.stats()
+        if url.path == '/check':
+            if 'cas' in query:
+                result = self.service.check_cas(query['cas'][0])
+            elif 'name' in query:
+                result = self.service.check_name(query['name'][0])
+            else:
+                raise ValueError("Provide a 'cas' or 'name' query parameter.")
+            # An unknown answer means PubChem could not be reached, not that the chemical is safe
+            return (502 if result['status'] == 'unknown' else 200), result
+        return 404, {'error': f"Unknown endpoint: {url.path}"}
+
+    def _handle_post(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        body = self._read_body()
+
+        if url.path == '/scan':
+            filename = query.get('filename', ['uploaded.pdf'])[0]
+            if self.headers.get('Content-Type', '').startswith('application/pdf'):
+                return 200, self.service.scan_pdf(body, filename)
+            return 200, self.service.scan_text(body.decode('utf-8'), filename)
+        if url.path == '/refresh':
+            payload = json.loads(body or b'{}')
+            return 200, self.service.refresh(payload.get('chemicals', []))
+        return 404, {'error': f"Unknown endpoint: {url.path}"}
+
+    def log_message(self, format, *args):
+        pass  # Keep request logging out of the latency path
+
+
+def make_server(service, host='127.0.0.1', port=8080):
+    """Creates a threaded HTTP server bound to the given service."""
+    handler = type('BoundHazardRequestHandler', (HazardRequestHandler,), {'service': service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def load_enriched_inventory(source_folder):
+    """Loads the enriched inventory written by add_synonyms_to_inventory."""
+    inventory_path = os.path.join(source_folder, ENRICHED_INVENTORY_FILENAME)
+    if not os.path.exists(inventory_path):
+        raise FileNotFoundError(f"Enriched inventory not found: {inventory_path}. Run main.py first.")
+    print(f"📂 Loading enriched inventory: {inventory_path}")
+    return pd.read_excel(inventory_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve HazardPyMatch hazard checks over HTTP/JSON.")
+    parser.add_argument('--source-folder', required=True, help="Folder holding the enriched inventory from main.py")
+    parser.add_argument('--ghs-codes', required=True, help="Relevant GHS codes separated by commas (e.g., H200,H360FD)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--match-mode', choices=MATCH_MODES, default='exact',
+                        help="'normalized' matches case-insensitively on de-hyphenated, whitespace-collapsed text")
+    args = parser.parse_args()
+
+    relevant_ghs_codes = [code.strip().upper() for code in args.ghs_codes.split(',') if code.strip()]
+
+    # Prefer the memory-mapped master list saved by match_hazards_in_protocols
+    master_list_folder = os.path.join(args.source_folder, MASTER_LIST_FOLDER)
+    if os.path.isdir(master_list_folder):
+        print(f"📂 Loading master list: {master_list_folder}")
+        service = HazardService(None, relevant_ghs_codes, master_list=CompactMasterList.load(master_list_folder),
+                                match_mode=args.match_mode)
+    else:
+        service = HazardService(load_enriched_inventory(args.source_folder), relevant_ghs_codes,
+                                match_mode=args.match_mode)
+
+    server = make_server(service, args.host, args.port)
+    print(f"HazardPyMatch service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
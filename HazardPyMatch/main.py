@@ -9,7 +9,8 @@ from ghs_scraper import update_ghs_codes
 from ghs_filter import filter_ghs_codes
 from synonym_lookup import add_synonyms_to_inventory
 from protocol_matcher import match_hazards_in_protocols
-from visualization import plot_ghs_code_distribution, plot_hazardous_protocols, plot_cas_occurrences
+from hazard_report import generate_hazard_report
+from checkpoint import clear_checkpoints
 
 def main():
     print("Starting Hazard Analysis Pipeline...\n")
@@ -19,6 +20,9 @@ def main():
     print_intermediate_steps = prompt_print_intermediate_steps()
     relevant_ghs_codes = get_relevant_ghs_codes()
 
+    # Partial PubChem results are checkpointed here, so an interrupted run resumes where it stopped
+    checkpoint_folder = os.path.join(source_folder, "checkpoints")
+
     # Step 2 - Load Chemical Inventory
     df_inventory = load_inventory(source_folder)
 
@@ -26,14 +30,16 @@ def main():
     df_inventory, df_proprietaryRxs_andOther = extract_missing_cas(
         df_inventory, 
         print_intermediate_steps=print_intermediate_steps, 
-        source_folder=source_folder
+        source_folder=source_folder,
+        checkpoint_folder=checkpoint_folder
     )
 
     # Step 4 - Retrieve GHS Hazard Codes
     df_inventory = update_ghs_codes(
         df_inventory, 
         print_intermediate_steps=print_intermediate_steps, 
-        source_folder=source_folder
+        source_folder=source_folder,
+        checkpoint_folder=checkpoint_folder
     )
 
     # Step 5 - Filter Relevant GHS Codes
@@ -48,7 +54,8 @@ def main():
     df_inventory = add_synonyms_to_inventory(
         relevant_ghs_df, 
         print_intermediate_steps=print_intermediate_steps, 
-        source_folder=source_folder
+        source_folder=source_folder,
+        checkpoint_folder=checkpoint_folder
     )
 
     # Step 7 - Match Hazards in Protocols
@@ -58,10 +65,11 @@ def main():
         source_folder
     )
 
-    # Step 8 - Generate Visualizations
-    plot_ghs_code_distribution(df_inventory, source_folder=source_folder)
-    plot_hazardous_protocols(df_hazards, source_folder=source_folder)
-    plot_cas_occurrences(df_inventory, source_folder=source_folder)
+    # Step 8 - Generate Visualizations and Report
+    generate_hazard_report(df_inventory, df_hazards, source_folder=source_folder)
+
+    # The run finished, so the next run must look everything up again instead of resuming
+    clear_checkpoints(checkpoint_folder)
 
     # Printed Summary Output
     print("\n Processing complete with the following settings:")
@@ -73,7 +81,9 @@ def main():
     print(f"Missing CAS Numbers saved to: {source_folder}/Chemical_List_noCAS.xlsx")
     print(f"Hazardous Protocols saved to: {source_folder}/hazards_in_protocols.xlsx")
     print(f"Protocol Matched Hazard Details saved to: {source_folder}/protocol_matched_hazard_details.xlsx")
+    print(f"Protocol x CAS Hazard Index saved to: {source_folder}/hazard_index")
     print(f"Visualizations saved in: {source_folder}")
+    print(f"HTML Report saved to: {source_folder}/HazardPyMatch_Report.html")
 
     print("\n Hazard Analysis Pipeline Completed Successfully!")
 
@@ -0,0 +1,234 @@
+# master_list.py
+
+import os
+import json
+import time
+import shutil
+import numpy as np
+import pandas as pd
+
+MASTER_LIST_FOLDER = "master_list"
+CURRENT_VERSION_FILE = "CURRENT"  # Names the version subfolder that load() reads
+ARRAY_NAMES = ('row_cas_codes', 'row_ghs_codes', 'row_pubchem_ids', 'row_ids', 'entry_in_list', 'arena', 'offsets')
+
+
+class CompactMasterList:
+    """Dictionary-encoded master list of (CAS Number, Synonym, PubChem ID, GHS Codes) entries.
+
+    CAS Numbers and GHS Code strings are stored once in dictionaries and referenced by int32 codes
+    per inventory row, together with the row's PubChem ID (-1 if missing). Synonyms live in one
+    contiguous UTF-8 arena addressed by int64 offsets, and every entry keeps the int32 inventory row
+    it came from and a uint8 in-list flag, so per-synonym storage is 13 bytes plus the synonym text.
+
+    An entry is in-list when the synonym is one of the inventory's own names for its CAS Number
+    (a Chemical Name or In-List Synonym), as opposed to a synonym fetched from PubChem.
+    """
+
+    def __init__(self, cas_values, ghs_values, row_cas_codes, row_ghs_codes, row_pubchem_ids, row_ids, entry_in_list,
+                 arena, offsets):
+        self.cas_values = list(cas_values)
+        self.ghs_values = list(ghs_values)
+        self.row_cas_codes = row_cas_codes
+        self.row_ghs_codes = row_ghs_codes
+        self.row_pubchem_ids = row_pubchem_ids
+        self.row_ids = row_ids
+        self.entry_in_list = entry_in_list
+        self.arena = arena
+        self.offsets = offsets
+        self._name_hashes = None  # Sorted synonym hashes for find_synonym, built on first use
+        self._name_order = None
+
+    @classmethod
+    def from_inventory(cls, df_inventory):
+        """Builds the compact master list from an enriched inventory (synonyms from the 5th column on)."""
+        print("....................Creating Compact Master List for Protocol Matching")
+
+        cas_index, ghs_index = {}, {}
+        row_cas_codes, row_ghs_codes, row_ids, entry_in_list = [], [], [], []
+        arena = bytearray()
+        offsets = [0]
+
+        synonym_columns = df_inventory.columns[4:]
+        synonym_values = df_inventory.iloc[:, 4:].to_numpy(dtype=object)
+        cas_column = df_inventory['CAS Number'].to_numpy(dtype=object)
+
+        # The inventory's own names for each CAS Number, to tell in-list synonyms from PubChem ones
+        in_list_columns = [column for column in synonym_columns if str(column).startswith('In-List Synonym')]
+        inventory_names = {}
+        if 'Chemical Name' in df_inventory.columns:
+            in_list_columns.append('Chemical Name')
+        for column in in_list_columns:
+            for cas_number, name in zip(cas_column, df_inventory[column]):
+                if pd.notna(name):
+                    inventory_names.setdefault(cas_number, set()).add(str(name).strip().lower())
+
+        ghs_column = df_inventory['GHS Codes'].to_numpy(dtype=object)
+        pubchem_column = pd.to_numeric(df_inventory['PubChem ID'], errors='coerce').to_numpy(dtype=float)
+
+        for row, synonyms in enumerate(synonym_values):
+            row_cas_codes.append(cas_index.setdefault(cas_column[row], len(cas_index)))
+            ghs_value = ghs_column[row]
+            row_ghs_codes.append(-1 if pd.isna(ghs_value) else ghs_index.setdefault(ghs_value, len(ghs_index)))
+
+            names = inventory_names.get(cas_column[row], ())
+            for synonym in synonyms:
+                if pd.notna(synonym):  # Ensure synonym is not NaN
+                    synonym = str(synonym).strip()
+                    arena += synonym.encode('utf-8')
+                    offsets.append(len(arena))
+                    row_ids.append(row)
+                    entry_in_list.append(synonym.lower() in names)
+
+        row_pubchem_ids = np.where(np.isnan(pubchem_column), -1, pubchem_column).astype(np.int64)
+
+        return cls(
+            cas_values=list(cas_index),
+            ghs_values=list(ghs_index),
+            row_cas_codes=np.asarray(row_cas_codes, dtype=np.int32),
+            row_ghs_codes=np.asarray(row_ghs_codes, dtype=np.int32),
+            row_pubchem_ids=row_pubchem_ids,
+            row_ids=np.asarray(row_ids, dtype=np.int32),
+            entry_in_list=np.asarray(entry_in_list, dtype=np.uint8),
+            arena=np.frombuffer(bytes(arena), dtype=np.uint8),
+            offsets=np.asarray(offsets, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Builds a compact master list from (CAS_Number, Synonym, PubChem_ID, GHS_Codes) tuples, one row each.
+
+        The entries carry no inventory names, so none of them is flagged in-list.
+        """
+        entries = list(entries)
+        df_rows = pd.DataFrame(
+            [(cas_number, pubchem_id, ghs_codes, synonym) for cas_number, synonym, pubchem_id, ghs_codes in entries],
+            columns=['CAS Number', 'PubChem ID', 'GHS Codes', 'Synonym'],
+        )
+        # Same layout as the inventory: four leading columns, then the synonym
+        df_rows.insert(0, 'Source', 'entries')
+        return cls.from_inventory(df_rows)
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def synonym(self, i):
+        return bytes(self.arena[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def cas_number(self, i):
+        return self.cas_values[self.row_cas_codes[self.row_ids[i]]]
+
+    def ghs_code_string(self, i):
+        code = self.row_ghs_codes[self.row_ids[i]]
+        return self.ghs_values[code] if code >= 0 else np.nan
+
+    def pubchem_id(self, i):
+        pubchem_id = self.row_pubchem_ids[self.row_ids[i]]
+        return int(pubchem_id) if pubchem_id >= 0 else np.nan
+
+    def in_list(self, i):
+        return bool(self.entry_in_list[i])
+
+    def __getitem__(self, i):
+        return (self.cas_number(i), self.synonym(i), self.pubchem_id(i), self.ghs_code_string(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def find_synonym(self, name):
+        """Returns the entry indices whose synonym equals name, ignoring case and surrounding whitespace.
+
+        The first call builds a sorted array of synonym hashes (16 bytes per entry), so lookups are a
+        binary search plus decoding the few candidate entries.
+        """
+        if self._name_hashes is None:
+            hashes = np.fromiter((hash(self.synonym(i).lower()) for i in range(len(self))), dtype=np.int64, count=len(self))
+            self._name_order = np.argsort(hashes, kind='stable')
+            self._name_hashes = hashes[self._name_order]
+
+        key = name.strip().lower()
+        h = hash(key)
+        lo = np.searchsorted(self._name_hashes, h, side='left')
+        hi = np.searchsorted(self._name_hashes, h, side='right')
+        return [int(i) for i in self._name_order[lo:hi] if self.synonym(i).lower() == key]
+
+    def select(self, indices):
+        """Returns a new master list holding only the entries at the given indices (in that order)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+        offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+
+        # Gather every kept synonym's bytes into a new contiguous arena in one vectorized step
+        positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1], dtype=np.int64)
+
+        return CompactMasterList(
+            self.cas_values, self.ghs_values,
+            row_cas_codes=self.row_cas_codes,
+            row_ghs_codes=self.row_ghs_codes,
+            row_pubchem_ids=self.row_pubchem_ids,
+            row_ids=np.asarray(self.row_ids[indices], dtype=np.int32),
+            entry_in_list=np.asarray(self.entry_in_list[indices], dtype=np.uint8),
+            arena=np.asarray(self.arena[positions], dtype=np.uint8),
+            offsets=offsets,
+        )
+
+    def to_dataframe(self):
+        """Expands the compact list into the create_master_list DataFrame layout."""
+        return pd.DataFrame(list(self), columns=['CAS_Number', 'Synonym', 'PubChem_ID', 'GHS_Codes'])
+
+    def nbytes(self):
+        """Approximate memory held by the arrays and dictionaries."""
+        arrays = [getattr(self, name) for name in ARRAY_NAMES]
+        dictionaries = sum(len(str(value)) for value in self.cas_values + self.ghs_values)
+        return sum(array.nbytes for array in arrays) + dictionaries
+
+    def save(self, folder):
+        """Saves the arrays as .npy files and the dictionaries as JSON in a new version subfolder of folder.
+
+        The CURRENT file is then atomically switched to the new version and older versions are removed.
+        Files are never rewritten in place, so a process that memory-mapped an earlier save keeps
+        reading consistent arrays, and load() never sees a half-written version.
+        """
+        os.makedirs(folder, exist_ok=True)
+        version = f"v{time.time_ns():020d}"
+        version_folder = os.path.join(folder, version)
+        os.makedirs(version_folder)
+
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(version_folder, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(version_folder, "dictionaries.json"), "w", encoding="utf-8") as f:
+            json.dump({'cas_values': [str(v) for v in self.cas_values], 'ghs_values': self.ghs_values}, f)
+
+        tmp_path = os.path.join(folder, f"{CURRENT_VERSION_FILE}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(folder, CURRENT_VERSION_FILE))
+
+        # Mapped files of removed versions stay readable until they are unmapped (POSIX unlink semantics)
+        for entry in os.listdir(folder):
+            if entry.startswith('v') and entry < version and os.path.isdir(os.path.join(folder, entry)):
+                shutil.rmtree(os.path.join(folder, entry), ignore_errors=True)
+        return folder
+
+    @classmethod
+    def load(cls, folder, mmap=True):
+        """Loads a saved master list, memory-mapping the arrays unless mmap is False."""
+        current_path = os.path.join(folder, CURRENT_VERSION_FILE)
+        if os.path.exists(current_path):
+            with open(current_path, encoding="utf-8") as f:
+                folder = os.path.join(folder, f.read().strip())
+
+        mmap_mode = 'r' if mmap else None
+        arrays = {
+            name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in ARRAY_NAMES if os.path.exists(os.path.join(folder, f"{name}.npy"))
+        }
+        if 'entry_in_list' not in arrays:
+            # Saved before in-list flags existed: treat every synonym as a PubChem synonym
+            arrays['entry_in_list'] = np.zeros(len(arrays['row_ids']), dtype=np.uint8)
+        with open(os.path.join(folder, "dictionaries.json"), encoding="utf-8") as f:
+            dictionaries = json.load(f)
+        return cls(dictionaries['cas_values'], dictionaries['ghs_values'], **arrays)
@@ -2,8 +2,15 @@
 
 import os
 import re
+import time
+import bisect
+import numpy as np
 import pandas as pd
 import pdfplumber
+from master_list import CompactMasterList, MASTER_LIST_FOLDER
+from synonym_quality import DEFAULT_SYNONYM_RULES, prune_master_list, compare_scan_times
+from hazard_index import HazardIndex, HAZARD_INDEX_FOLDER
+from text_normalization import normalize_text, normalize_synonym, original_span
 
 def get_protocol_filenames(protocols_folder):
     """Retrieves the list of PDF filenames (without extensions) from the given folder."""
@@ -31,95 +38,333 @@ def create_master_list(df_inventory):
 
     return master_list_df
 
-def match_hazards_in_protocols(df_inventory, protocols_folder, source_folder):
-    """Matches hazards from the chemical inventory against protocol PDFs."""
-    print("....................Matching Hazards in Protocols")
+MATCH_MODES = ("exact", "normalized")
 
-    master_list_df = create_master_list(df_inventory)
+# Word runs and single punctuation characters; whitespace only separates tokens
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+# Normalized synonyms with more hyphens than this are checked by substring instead of being indexed
+MAX_INDEXED_HYPHENS = 6
 
-    hazards = []
-    matched_details = []
 
-    # Iterate through the protocol PDF files
-    for filename in os.listdir(protocols_folder):
-        print(f"Processing protocol: {filename}")  # Current file being processed
-        
-        if filename.endswith('.pdf') and filename != "Hazards In Protocols.txt":
-            extracted_text = ''  # Initialize extracted text for the current PDF
-            try:
-                with pdfplumber.open(os.path.join(protocols_folder, filename)) as pdf:
-                    for page in pdf.pages:
-                        extracted_text += page.extract_text() or ''  # Extract text from each page
-
-            except Exception as e:
-                print(f"Error processing {filename}: {e}")  # Handle PDF processing errors
+def _token_key(text):
+    return ' '.join(TOKEN_PATTERN.findall(text))
+
+
+class SynonymMatcher:
+    """Whole-word synonym matcher built once from master lists and reused across protocols.
+
+    mode="exact" matches synonyms case-sensitively against the raw text. mode="normalized" normalizes
+    the text once per protocol (case folding, Unicode dashes, de-hyphenation, whitespace collapse),
+    matches synonyms normalized the same way, and maps hits back to offsets in the raw text.
+
+    Entries stay in their CompactMasterLists: the matcher only keeps one pattern key per unique
+    synonym and an int32 pattern id per entry, and decodes entries when they match.
+
+    Each pattern key is indexed by its token sequence, so a scan is a single pass over the text's
+    tokens looking up token n-grams; the whole-word regex (compiled on first use) only confirms the
+    candidates found. A regex hit always spans whole tokens, so no match is missed. In normalized
+    mode a key is indexed under every way its optional hyphens can split or join words.
+    """
+
+    def __init__(self, master_list=None, mode="exact"):
+        if mode not in MATCH_MODES:
+            raise ValueError(f"Unknown match mode '{mode}'. Choose from {MATCH_MODES}.")
+        self.mode = mode
+        self.sources = []        # CompactMasterLists holding the entries, in master list order
+        self.source_starts = []  # index of each source's first entry
+        self.entry_pattern_ids = np.zeros(0, dtype=np.int32)  # pattern id of each entry, -1 if skipped
+        self.patterns = []       # unique pattern keys (the synonym itself, or its normalized form)
+        self.token_index = {}    # space-joined tokens -> pattern id, or tuple of ids sharing the tokens
+        self.first_tokens = {}   # first token of multi-token keys -> most tokens of any key starting with it
+        self.unindexed = []      # pattern ids checked by substring (normalized keys with many hyphens)
+        self.compiled = {}       # pattern id -> whole-word regex, compiled on first use
+        if master_list is not None:
+            self.extend(master_list)
+
+    def pattern_key(self, synonym):
+        return normalize_synonym(synonym) if self.mode == "normalized" else synonym
+
+    def extend(self, master_list):
+        """Adds master list entries (DataFrame or CompactMasterList), registering only unseen synonyms."""
+        if isinstance(master_list, pd.DataFrame):
+            master_list = CompactMasterList.from_entries(master_list.itertuples(index=False))
+
+        # The key -> id lookup is only needed while extending, so it is not kept on the matcher
+        known_ids = {key: pattern_id for pattern_id, key in enumerate(self.patterns)}
+        pattern_ids = np.full(len(master_list), -1, dtype=np.int32)
+        for i in range(len(master_list)):
+            synonym = master_list.synonym(i)
+            key = self.pattern_key(synonym) if synonym else ''
+            if not key:
+                continue
+            pattern_id = known_ids.get(key)
+            if pattern_id is None:
+                pattern_id = known_ids[key] = len(self.patterns)
+                self.patterns.append(key)
+                self._index_pattern(pattern_id, key)
+            pattern_ids[i] = pattern_id
+
+        self.source_starts.append(len(self.entry_pattern_ids))
+        self.sources.append(master_list)
+        self.entry_pattern_ids = np.concatenate([self.entry_pattern_ids, pattern_ids])
+
+    def _token_keys(self, key):
+        """The token sequences (space-joined) a whole-word hit of key can have in the searched text."""
+        if self.mode == "exact":
+            return {_token_key(key)}
+
+        # Hyphens are optional: each one either stays (a token separator) or is dropped (joining words)
+        parts = key.split('-')
+        token_keys = set()
+        for mask in range(2 ** (len(parts) - 1)):
+            variant = parts[0]
+            for j, part in enumerate(parts[1:]):
+                variant += ('' if mask >> j & 1 else ' ') + part
+            token_keys.add(_token_key(variant))
+        return token_keys
+
+    def _index_pattern(self, pattern_id, key):
+        if self.mode == "normalized" and key.count('-') > MAX_INDEXED_HYPHENS:
+            self.unindexed.append(pattern_id)
+            return
+        for token_key in self._token_keys(key):
+            if not token_key:
+                self.unindexed.append(pattern_id)
                 continue
+            if token_key == key:
+                token_key = key  # Share the pattern key's string instead of storing a copy
+            existing = self.token_index.get(token_key)
+            if existing is None:
+                self.token_index[token_key] = pattern_id
+            elif isinstance(existing, tuple):
+                self.token_index[token_key] = existing + (pattern_id,)
+            else:
+                self.token_index[token_key] = (existing, pattern_id)
+
+            n_tokens = token_key.count(' ') + 1
+            if n_tokens > 1:
+                first_token = token_key.split(' ', 1)[0]
+                if self.first_tokens.get(first_token, 0) < n_tokens:
+                    self.first_tokens[first_token] = n_tokens
+
+    def copy(self):
+        """Returns a copy that can be extended without affecting this matcher."""
+        matcher = SynonymMatcher(mode=self.mode)
+        matcher.sources = list(self.sources)
+        matcher.source_starts = list(self.source_starts)
+        matcher.entry_pattern_ids = self.entry_pattern_ids  # Never modified in place
+        matcher.patterns = list(self.patterns)
+        matcher.token_index = dict(self.token_index)
+        matcher.first_tokens = dict(self.first_tokens)
+        matcher.unindexed = list(self.unindexed)
+        matcher.compiled = dict(self.compiled)
+        return matcher
+
+    def __len__(self):
+        return int((self.entry_pattern_ids >= 0).sum())
+
+    def entry(self, i):
+        """Decodes entry i as (CAS_Number, Synonym, PubChem_ID, GHS_Codes)."""
+        source = bisect.bisect_right(self.source_starts, i) - 1
+        return self.sources[source][i - self.source_starts[source]]
 
-            # Search for matches in the extracted text across all synonyms
-            matched_cas_numbers = []
-            matched_pubchem_ids = []
-            matched_ghs_codes = []
-
-            for row in master_list_df.itertuples(index=False):
-                cas_number, synonym, pubchem_id, ghs_codes = row
-
-                # Perform case-sensitive whole-word matching using regex
-                pattern = fr'\b{re.escape(synonym)}\b'
-                if re.search(pattern, extracted_text):  # Check for whole-word match
-                    matched_cas_numbers.append(cas_number)
-                    matched_pubchem_ids.append(pubchem_id)
-                    matched_ghs_codes.append(ghs_codes)
-
-                    # Append details for matched synonyms
-                    matched_details.append({
-                        'Protocol': filename,
-                        'Synonym': synonym,
-                        'CAS Number': cas_number,
-                        'PubChem_ID': pubchem_id,
-                        'GHS_Codes': ghs_codes
-                    })
-
-            # Remove duplicate CAS numbers while keeping order
-            unique_cas_set = set()
-            unique_details = []
-            unique_matched_cas_numbers = []
-            unique_matched_pubchem_ids = []
-            unique_matched_ghs_codes = []
-
-            for i, cas in enumerate(matched_cas_numbers):
-                if cas not in unique_cas_set:
-                    unique_cas_set.add(cas)
-                    unique_matched_cas_numbers.append(cas)
-                    unique_matched_pubchem_ids.append(matched_pubchem_ids[i])
-                    unique_matched_ghs_codes.append(matched_ghs_codes[i])
-                    unique_details.append(matched_details[i])
-
-            matched_cas_numbers = unique_matched_cas_numbers
-            matched_pubchem_ids = unique_matched_pubchem_ids
-            matched_ghs_codes = unique_matched_ghs_codes
-            matched_details = unique_details
-
-            # Prepare hazard entry for each protocol
-            list_name = filename.replace('.pdf', '')
-            parts = list_name.split('_', 1)  # Split at the first underscore
-            protocol = parts[0]
-            source = parts[1] if len(parts) > 1 else ""
-
-            if not matched_cas_numbers:
-                matched_hazards_str = "N/A"
-                print(f"No matches found for {filename}")
+    def _pattern(self, pattern_id):
+        pattern = self.compiled.get(pattern_id)
+        if pattern is None:
+            key = self.patterns[pattern_id]
+            if self.mode == "normalized":
+                pattern = re.compile(r'\b' + re.escape(key).replace(r'\-', '-?') + r'\b')
             else:
-                matched_hazards_str = ', '.join(matched_cas_numbers)
-                print(f"Matched CAS numbers for {filename}: {matched_hazards_str}")
+                # Case-sensitive whole-word matching, as before
+                pattern = re.compile(fr'\b{re.escape(key)}\b')
+            self.compiled[pattern_id] = pattern
+        return pattern
+
+    def search(self, extracted_text):
+        """Returns {pattern id: (start, end)} of the first whole-word hit of each synonym in the raw text."""
+        if self.mode == "normalized":
+            search_text, offsets = normalize_text(extracted_text)
+        else:
+            search_text, offsets = extracted_text, None
+
+        # One pass over the tokens, looking up each token and every longer n-gram that starts with
+        # the first token of a multi-token key. In normalized mode hyphens separate tokens, as in
+        # the indexed hyphen variants.
+        token_matches = list(TOKEN_PATTERN.finditer(search_text if offsets is None else search_text.replace('-', ' ')))
+        tokens = [token_match.group() for token_match in token_matches]
+        candidates = {}  # pattern id -> index of the first token where it may start
+        token_index = self.token_index
+        for i, token in enumerate(tokens):
+            n_max = min(self.first_tokens.get(token, 1), len(tokens) - i)
+            token_key = token
+            for n in range(n_max):
+                if n:
+                    token_key += ' ' + tokens[i + n]
+                found = token_index.get(token_key)
+                if found is None:
+                    continue
+                for pattern_id in found if isinstance(found, tuple) else (found,):
+                    candidates.setdefault(pattern_id, i)
+
+        # The few keys that are not indexed fall back to a substring prefilter
+        for pattern_id in self.unindexed:
+            if max(self.patterns[pattern_id].split('-'), key=len) in search_text:
+                candidates[pattern_id] = None
+
+        spans = {}
+        for pattern_id, first_token in candidates.items():
+            # No hit can start before the first token sequence the key was found at, apart from
+            # optional leading hyphens and spaces, which are not tokens
+            start = 0 if first_token is None else token_matches[first_token].start()
+            while start and search_text[start - 1] in '- ':
+                start -= 1
+            hit = self._pattern(pattern_id).search(search_text, start)
+            if hit:
+                spans[pattern_id] = hit.span() if offsets is None else original_span(offsets, *hit.span())
+        return spans
+
+    def matching_synonyms(self, extracted_text):
+        """Returns the pattern keys of the synonyms that occur as whole words in the text."""
+        return {self.patterns[pattern_id] for pattern_id in self.search(extracted_text)}
+
+    def match_spans(self, extracted_text):
+        """Returns (entry, start, end) for every matching master list entry, in master list order."""
+        spans = self.search(extracted_text)
+        if not spans:
+            return []
+        matched = np.flatnonzero(np.isin(self.entry_pattern_ids, np.fromiter(spans, dtype=np.int32)))
+        return [
+            (self.entry(i),) + spans[pattern_id]
+            for i, pattern_id in zip(matched.tolist(), self.entry_pattern_ids[matched].tolist())
+        ]
+
+    def match(self, extracted_text):
+        """Returns the matching master list entries, in master list order."""
+        return [entry for entry, _, _ in self.match_spans(extracted_text)]
+
+
+def extract_protocol_text(pdf_source):
+    """Extracts the text of every page of a protocol PDF (path or file-like object)."""
+    extracted_text = ''
+    with pdfplumber.open(pdf_source) as pdf:
+        for page in pdf.pages:
+            extracted_text += page.extract_text() or ''  # Extract text from each page
+    return extracted_text
+
+
+def match_protocol_text(filename, extracted_text, matcher):
+    """Matches one protocol's text and returns its hazard row and matched details (one per CAS)."""
+
+    # Keep the first matching synonym for each CAS number, preserving master list order
+    unique_cas_set = set()
+    matched_cas_numbers = []
+    matched_details = []
 
-            # Append protocol, source, and matched CAS numbers to hazards list
-            hazards.append([protocol, source, matched_hazards_str])
+    for (cas_number, synonym, pubchem_id, ghs_codes), start, end in matcher.match_spans(extracted_text):
+        if cas_number in unique_cas_set:
+            continue
+        unique_cas_set.add(cas_number)
+        matched_cas_numbers.append(cas_number)
+        matched_details.append({
+            'Protocol': filename,
+            'Synonym': synonym,
+            'CAS Number': cas_number,
+            'PubChem_ID': pubchem_id,
+            'GHS_Codes': ghs_codes,
+            'Match Start': start,  # Offsets of the first hit in the extracted text
+            'Match End': end
+        })
+
+    # Prepare hazard entry for the protocol
+    list_name = filename.replace('.pdf', '')
+    parts = list_name.split('_', 1)  # Split at the first underscore
+    protocol = parts[0]
+    source = parts[1] if len(parts) > 1 else ""
+
+    if not matched_cas_numbers:
+        matched_hazards_str = "N/A"
+        print(f"No matches found for {filename}")
+    else:
+        matched_hazards_str = ', '.join(str(cas) for cas in matched_cas_numbers)
+        print(f"Matched CAS numbers for {filename}: {matched_hazards_str}")
+
+    return [protocol, source, matched_hazards_str], matched_details
+
+
+def build_protocol_matcher(df_inventory, source_folder, synonym_rules=DEFAULT_SYNONYM_RULES, match_mode="exact",
+                           keep_unpruned=False):
+    """Builds, saves and prunes the master list and compiles the synonym matcher.
+
+    Returns (matcher, unpruned_matcher); unpruned_matcher is None unless keep_unpruned is set.
+    """
+    # Dictionary-encoded master list, saved so later runs and the service can memory-map it
+    master_list = CompactMasterList.from_inventory(df_inventory)
+    master_list_path = master_list.save(os.path.join(source_folder, MASTER_LIST_FOLDER))
+    print(f"Master list ({len(master_list)} synonyms, {master_list.nbytes() / 1e6:.1f} MB) saved to: {master_list_path}")
+
+    # Drop registry IDs, very short and highly ambiguous synonyms before compiling patterns
+    unpruned_matcher = SynonymMatcher(master_list, mode=match_mode) if keep_unpruned else None
+    if synonym_rules is not None:
+        master_list, _, _ = prune_master_list(master_list, synonym_rules, source_folder=source_folder)
+
+    # Compile every synonym pattern once, instead of once per protocol
+    return SynonymMatcher(master_list, mode=match_mode), unpruned_matcher
+
+
+def list_protocol_files(protocols_folder):
+    """Returns the protocol PDF filenames in a deterministic (sorted) order."""
+    return sorted(f for f in os.listdir(protocols_folder) if f.endswith('.pdf'))
+
+
+def scan_protocol_files(protocols_folder, filenames, matcher, scanned_texts=None):
+    """Extracts and matches each protocol PDF.
+
+    Returns a list of (filename, hazard_row, matched_details) and the total matching time. Extracted
+    texts are appended to scanned_texts when a list is given.
+    """
+    results = []
+    scan_time = 0.0
+
+    for filename in filenames:
+        print(f"Processing protocol: {filename}")  # Current file being processed
+
+        try:
+            extracted_text = extract_protocol_text(os.path.join(protocols_folder, filename))
+
+        except Exception as e:
+            print(f"Error processing {filename}: {e}")  # Handle PDF processing errors
+            continue
+
+        start = time.perf_counter()
+        hazard_row, protocol_details = match_protocol_text(filename, extracted_text, matcher)
+        scan_time += time.perf_counter() - start
+        if scanned_texts is not None:
+            scanned_texts.append(extracted_text)
+        results.append((filename, hazard_row, protocol_details))
+
+    return results, scan_time
+
+
+def save_protocol_results(results, source_folder, df_inventory=None):
+    """Converts (filename, hazard_row, matched_details) results to DataFrames, sorted by filename, and saves them.
+
+    With df_inventory, the protocol x CAS hazard index is also built and saved (see hazard_index).
+    """
+
+    # Sorting by filename makes the output independent of scan order (and of sharding)
+    results = sorted(results, key=lambda result: result[0])
+    hazards = [hazard_row for _, hazard_row, _ in results]
+    matched_details = [detail for _, _, protocol_details in results for detail in protocol_details]
 
     # Convert hazards list to a DataFrame
     df_hazards = pd.DataFrame(hazards, columns=['Protocol', 'Source', 'Hazards'])
 
     # Convert matched details list to a DataFrame
-    df_matched_details = pd.DataFrame(matched_details, columns=['Protocol', 'Synonym', 'CAS Number', 'PubChem_ID', 'GHS_Codes'])
+    # Match Start / Match End are the offsets of the first hit in the protocol's extracted text
+    df_matched_details = pd.DataFrame(
+        matched_details,
+        columns=['Protocol', 'Synonym', 'CAS Number', 'PubChem_ID', 'GHS_Codes', 'Match Start', 'Match End'],
+    )
 
     # Save the hazards DataFrame to an Excel file
     hazards_output_path = os.path.join(source_folder, "hazards_in_protocols.xlsx")
@@ -131,7 +376,40 @@ def match_hazards_in_protocols(df_inventory, protocols_folder, source_folder):
     df_matched_details.to_excel(matched_output_path, index=False)
     print(f"Protocol Matched Hazard Details saved to: {matched_output_path}")
 
+    # Save the sparse protocol x CAS matrix and per-CAS H-code summary for fast queries
+    if df_inventory is not None:
+        index_path = HazardIndex.build(df_inventory, results).save(os.path.join(source_folder, HAZARD_INDEX_FOLDER))
+        print(f"Protocol x CAS Hazard Index saved to: {index_path}")
+
+    return df_hazards, df_matched_details
+
+
+def match_hazards_in_protocols(df_inventory, protocols_folder, source_folder, synonym_rules=DEFAULT_SYNONYM_RULES,
+                               benchmark_pruning=False, match_mode="exact"):
+    """Matches hazards from the chemical inventory against protocol PDFs.
+
+    Synonyms are pruned with synonym_rules first (None disables pruning). With benchmark_pruning,
+    every protocol is also scanned with the unpruned synonyms to report before/after scan times.
+    match_mode="normalized" matches case-insensitively on normalized text (see SynonymMatcher).
+    """
+    print("....................Matching Hazards in Protocols")
+
+    matcher, unpruned_matcher = build_protocol_matcher(
+        df_inventory, source_folder, synonym_rules, match_mode, keep_unpruned=benchmark_pruning
+    )
+
+    # Iterate through the protocol PDF files
+    scanned_texts = [] if benchmark_pruning else None
+    results, scan_time = scan_protocol_files(
+        protocols_folder, list_protocol_files(protocols_folder), matcher, scanned_texts
+    )
+
+    print(f"Scanned {len(results)} protocols against {len(matcher.patterns)} synonym patterns in {scan_time:.3f}s")
+    if benchmark_pruning:
+        compare_scan_times(unpruned_matcher, matcher, scanned_texts)
+
+    df_hazards, df_matched_details = save_protocol_results(results, source_folder, df_inventory)
+
     print("....................Protocol Matching Complete")
     
     return df_hazards, df_matched_details
-           
@@ -0,0 +1,290 @@
+# protocol_sharding.py (sharded protocol scanning across worker processes or nodes)
+
+import os
+import glob
+import json
+import time
+import pickle
+import socket
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from synonym_quality import DEFAULT_SYNONYM_RULES
+from protocol_matcher import build_protocol_matcher, list_protocol_files, scan_protocol_files, save_protocol_results
+
+DEFAULT_FILES_PER_SHARD = 200
+DEFAULT_HEARTBEAT_SECONDS = 30
+DEFAULT_STALE_CLAIM_SECONDS = 300  # Ten missed heartbeats
+
+# Set once per worker process by _init_worker, so the matcher is shipped once, not once per shard
+_worker_matcher = None
+
+
+def shard_for(filename, n_shards):
+    """Stable shard number for a protocol filename (independent of PYTHONHASHSEED and machine)."""
+    digest = hashlib.md5(filename.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % n_shards
+
+
+def default_shard_count(n_files, n_workers=1, files_per_shard=DEFAULT_FILES_PER_SHARD):
+    """Shard count giving about files_per_shard protocols per shard and at least one shard per worker."""
+    return max(n_workers, -(-n_files // files_per_shard), 1)
+
+
+def partition_protocols(filenames, n_shards):
+    """Partitions protocol filenames into n_shards sorted lists by filename hash."""
+    shards = [[] for _ in range(n_shards)]
+    for filename in filenames:
+        shards[shard_for(filename, n_shards)].append(filename)
+    return [sorted(shard) for shard in shards]
+
+
+def _init_worker(matcher):
+    global _worker_matcher
+    _worker_matcher = matcher
+
+
+def _scan_shard(protocols_folder, filenames):
+    results, _ = scan_protocol_files(protocols_folder, filenames, _worker_matcher)
+    return results
+
+
+def match_hazards_sharded(df_inventory, protocols_folder, source_folder, n_workers=4, n_shards=None,
+                          synonym_rules=DEFAULT_SYNONYM_RULES, match_mode="exact"):
+    """Matches protocols in hash-partitioned shards across local worker processes.
+
+    n_shards defaults to about DEFAULT_FILES_PER_SHARD protocols per shard (at least one per worker).
+
+    Produces the same df_hazards / df_matched_details (sorted by filename) as match_hazards_in_protocols.
+    """
+    print("....................Matching Hazards in Protocols (sharded)")
+
+    matcher, _ = build_protocol_matcher(df_inventory, source_folder, synonym_rules, match_mode)
+    filenames = list_protocol_files(protocols_folder)
+    n_shards = n_shards or default_shard_count(len(filenames), n_workers)
+    shards = [shard for shard in partition_protocols(filenames, n_shards) if shard]
+    print(f"Scanning {sum(map(len, shards))} protocols in {len(shards)} shards with {n_workers} workers")
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(matcher,)) as executor:
+        futures = [executor.submit(_scan_shard, protocols_folder, shard) for shard in shards]
+        for future in futures:
+            results.extend(future.result())
+    print(f"Scanned {len(results)} protocols in {time.perf_counter() - start:.3f}s")
+
+    df_hazards, df_matched_details = save_protocol_results(results, source_folder, df_inventory)
+
+    print("....................Protocol Matching Complete")
+
+    return df_hazards, df_matched_details
+
+
+# File-based work queue: several local or networked worker nodes share one queue folder
+#   queue_folder/matcher.pkl       compiled matcher, loaded once per worker
+#   queue_folder/tasks/*.json      unclaimed shards
+#   queue_folder/claimed/*.json.*  shards being scanned (claimed by atomic rename, touched by a heartbeat)
+#   queue_folder/results/*.json    finished shards
+
+def _write_json_atomic(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def create_work_queue(queue_folder, protocols_folder, matcher, n_shards=None):
+    """Writes the matcher and one task file per non-empty shard to queue_folder. Returns the shard ids.
+
+    n_shards defaults to about DEFAULT_FILES_PER_SHARD protocols per shard.
+    """
+    for subfolder in ('tasks', 'claimed', 'results'):
+        os.makedirs(os.path.join(queue_folder, subfolder), exist_ok=True)
+        # Clear leftovers from a previous run so they are never merged into this one
+        for stale_path in glob.glob(os.path.join(queue_folder, subfolder, '*')):
+            os.remove(stale_path)
+
+    with open(os.path.join(queue_folder, 'matcher.pkl.tmp'), 'wb') as f:
+        pickle.dump(matcher, f)
+    os.replace(os.path.join(queue_folder, 'matcher.pkl.tmp'), os.path.join(queue_folder, 'matcher.pkl'))
+
+    filenames = list_protocol_files(protocols_folder)
+    n_shards = n_shards or default_shard_count(len(filenames))
+
+    shard_ids = []
+    for shard_id, filenames in enumerate(partition_protocols(filenames, n_shards)):
+        if not filenames:
+            continue
+        task = {'shard_id': shard_id, 'protocols_folder': os.path.abspath(protocols_folder), 'filenames': filenames}
+        _write_json_atomic(os.path.join(queue_folder, 'tasks', f"shard_{shard_id:05d}.json"), task)
+        shard_ids.append(shard_id)
+
+    print(f"Work queue with {len(shard_ids)} shards written to: {queue_folder}")
+    return shard_ids
+
+
+def _claim_next_task(queue_folder, worker_id):
+    """Claims the next unclaimed task by renaming it into claimed/; returns the claimed path or None."""
+    for task_path in sorted(glob.glob(os.path.join(queue_folder, 'tasks', '*.json'))):
+        claimed_path = os.path.join(queue_folder, 'claimed', f"{os.path.basename(task_path)}.{worker_id}")
+        try:
+            # Touch before renaming (rename keeps the mtime), so a fresh claim never looks stale
+            os.utime(task_path)
+            os.rename(task_path, claimed_path)  # Atomic: only one worker wins each task
+        except FileNotFoundError:
+            continue  # Claimed by another worker
+        return claimed_path
+    return None
+
+
+def _remove_claim(claimed_path):
+    try:
+        os.remove(claimed_path)
+    except FileNotFoundError:
+        pass  # The claim was re-queued while this worker was scanning
+
+
+class _ClaimHeartbeat:
+    """Touches a claim file every interval seconds while a shard is scanned, so it never looks stale."""
+
+    def __init__(self, claimed_path, interval=DEFAULT_HEARTBEAT_SECONDS):
+        self.claimed_path = claimed_path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                os.utime(self.claimed_path)
+            except FileNotFoundError:
+                return  # Re-queued by the coordinator; the scan still finishes and writes its result
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def run_queue_worker(queue_folder, worker_id=None, heartbeat=DEFAULT_HEARTBEAT_SECONDS):
+    """Scans queued shards until no unclaimed tasks remain. Returns the number of shards scanned.
+
+    Each claim is touched every heartbeat seconds while its shard is scanned.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+    with open(os.path.join(queue_folder, 'matcher.pkl'), 'rb') as f:
+        matcher = pickle.load(f)
+
+    scanned = 0
+    while True:
+        claimed_path = _claim_next_task(queue_folder, worker_id)
+        if claimed_path is None:
+            break
+
+        try:
+            with open(claimed_path, encoding='utf-8') as f:
+                task = json.load(f)
+        except FileNotFoundError:
+            continue  # Re-queued before it could be read; treat the claim as lost
+        result_path = os.path.join(queue_folder, 'results', f"shard_{task['shard_id']:05d}.json")
+        if os.path.exists(result_path):
+            # Re-queued although its first worker finished it; nothing left to scan
+            _remove_claim(claimed_path)
+            continue
+
+        with _ClaimHeartbeat(claimed_path, heartbeat):
+            results, _ = scan_protocol_files(task['protocols_folder'], task['filenames'], matcher)
+
+        # A shard scanned twice (after a re-queue) writes the same result, so the later write is harmless
+        _write_json_atomic(result_path, {'shard_id': task['shard_id'], 'worker': worker_id, 'results': results})
+        _remove_claim(claimed_path)
+        scanned += 1
+
+    print(f"Worker {worker_id} finished after {scanned} shards")
+    return scanned
+
+
+def requeue_stale_claims(queue_folder, stale_after=DEFAULT_STALE_CLAIM_SECONDS):
+    """Moves claims without a heartbeat for stale_after seconds (e.g. from a crashed worker) back to tasks/."""
+    requeued = 0
+    for claimed_path in glob.glob(os.path.join(queue_folder, 'claimed', '*.json.*')):
+        if time.time() - os.path.getmtime(claimed_path) < stale_after:
+            continue
+        task_name = os.path.basename(claimed_path).split('.json.', 1)[0] + '.json'  # Strip the worker id
+        try:
+            os.rename(claimed_path, os.path.join(queue_folder, 'tasks', task_name))
+            requeued += 1
+        except FileNotFoundError:
+            pass
+    return requeued
+
+
+def collect_queue_results(queue_folder, shard_ids, poll_interval=1.0, timeout=None,
+                          stale_after=DEFAULT_STALE_CLAIM_SECONDS):
+    """Waits for every shard's result file and returns the combined (filename, hazard_row, details) results."""
+    start = time.time()
+    expected = {shard_id: os.path.join(queue_folder, 'results', f"shard_{shard_id:05d}.json") for shard_id in shard_ids}
+
+    while not all(os.path.exists(path) for path in expected.values()):
+        if timeout is not None and time.time() - start > timeout:
+            missing = [shard_id for shard_id, path in expected.items() if not os.path.exists(path)]
+            raise TimeoutError(f"Shards still missing after {timeout}s: {missing}")
+        if requeue_stale_claims(queue_folder, stale_after):
+            print("Re-queued stale shard claims")
+        time.sleep(poll_interval)
+
+    results = []
+    for shard_id in sorted(expected):
+        with open(expected[shard_id], encoding='utf-8') as f:
+            results.extend(tuple(result) for result in json.load(f)['results'])
+    return results
+
+
+def match_hazards_with_queue(df_inventory, protocols_folder, source_folder, queue_folder, n_shards=None,
+                             n_local_workers=0, synonym_rules=DEFAULT_SYNONYM_RULES, match_mode="exact", timeout=None):
+    """Matches protocols through a file-based work queue served by local and/or remote worker nodes.
+
+    Remote nodes that see queue_folder (and the protocols folder) on a shared filesystem join with
+    `python protocol_sharding.py worker --queue <queue_folder>`. n_local_workers worker processes
+    are also started on this machine. n_shards defaults to about DEFAULT_FILES_PER_SHARD protocols
+    per shard.
+    """
+    print("....................Matching Hazards in Protocols (work queue)")
+
+    matcher, _ = build_protocol_matcher(df_inventory, source_folder, synonym_rules, match_mode)
+    shard_ids = create_work_queue(queue_folder, protocols_folder, matcher, n_shards)
+
+    if n_local_workers:
+        with ProcessPoolExecutor(max_workers=n_local_workers) as executor:
+            for _ in executor.map(run_queue_worker, [queue_folder] * n_local_workers):
+                pass
+
+    results = collect_queue_results(queue_folder, shard_ids, timeout=timeout)
+    df_hazards, df_matched_details = save_protocol_results(results, source_folder, df_inventory)
+
+    print("....................Protocol Matching Complete")
+
+    return df_hazards, df_matched_details
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a HazardPyMatch protocol scanning worker.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    worker_parser = subparsers.add_parser('worker', help="Scan shards from a work queue folder")
+    worker_parser.add_argument('--queue', required=True, help="Queue folder created by match_hazards_with_queue")
+    worker_parser.add_argument('--worker-id', default=None)
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        run_queue_worker(args.queue, args.worker_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,10 @@ import pandas as pd
 import os
 import re
 import requests
+from checkpoint import DEFAULT_CHECKPOINT_EVERY, open_checkpoint, run_checkpointed
+
+# Placeholder values written by fetch_synonyms_from_pubchem when no synonyms could be retrieved
+SYNONYM_PLACEHOLDERS = {"No synonyms found", "Error retrieving synonyms"}
 
 def filter_unique_cas_and_compile_synonyms(df_inventory):
     """Filters unique CAS numbers and compiles in-list synonyms for each CAS."""
@@ -75,9 +79,16 @@ def fetch_synonyms_from_pubchem(chemical_name):
             if substance_response.status_code == 200:
                 synonyms_text = substance_response.text.strip().split("\n")
                 results.append([chemical_name] + synonyms_text)
+            elif substance_response.status_code == 429 or substance_response.status_code >= 500:
+                print(f"⚠️ PubChem returned {substance_response.status_code} for {chemical_name}.")
+                results.append([chemical_name, "Error retrieving synonyms"])
             else:
                 print(f"⚠️ No synonyms found for {chemical_name} in PubChem.")
                 results.append([chemical_name, "No synonyms found"])
+        elif response.status_code == 429 or response.status_code >= 500:
+            # Rate limited or server error: report it as an error rather than as 'no synonyms'
+            print(f"⚠️ PubChem returned {response.status_code} for {chemical_name}.")
+            results.append([chemical_name, "Error retrieving synonyms"])
 
     except Exception as e:
         print(f"⚠️ Error fetching synonyms for {chemical_name}: {e}")
@@ -85,16 +96,30 @@ def fetch_synonyms_from_pubchem(chemical_name):
 
     return results if results else [[chemical_name, "No synonyms found"]]
 
-def add_synonyms_to_inventory(df_inventory, print_intermediate_steps=False, source_folder=None):
-    """Adds PubChem synonyms to the chemical inventory DataFrame after filtering unique names."""
+def add_synonyms_to_inventory(df_inventory, print_intermediate_steps=False, source_folder=None,
+                              checkpoint_folder=None, checkpoint_every=DEFAULT_CHECKPOINT_EVERY):
+    """Adds PubChem synonyms to the chemical inventory DataFrame after filtering unique names.
+
+    With a checkpoint_folder, fetched synonyms are checkpointed every checkpoint_every CAS Numbers
+    and a rerun only queries the CAS Numbers that were not completed.
+    """
 
     print("....................Adding Synonyms to Inventory")
 
     # Step 1️⃣: Filter unique chemical names before fetching from PubChem
     df_inventory = filter_unique_cas_and_compile_synonyms(df_inventory)
 
-    # Step 2️⃣: Fetch synonyms for **each unique CAS Number**
-    synonym_results = df_inventory["CAS Number"].apply(fetch_synonyms_from_pubchem)
+    # Step 2️⃣: Fetch synonyms for **each unique CAS Number**, skipping checkpointed ones
+    checkpoint = open_checkpoint(checkpoint_folder, "synonyms", checkpoint_every)
+    synonym_results = df_inventory["CAS Number"].apply(
+        lambda cas_number: run_checkpointed(
+            checkpoint, cas_number, fetch_synonyms_from_pubchem, cas_number,
+            # Errors come back as a placeholder; leave them out of the checkpoint so a rerun retries
+            keep_result=lambda result: "Error retrieving synonyms" not in result[0],
+        )
+    )
+    if checkpoint is not None:
+        checkpoint.flush()
 
     # Step 3️⃣: Convert results into a DataFrame with variable columns
     max_synonyms = max(len(res) for res in synonym_results)
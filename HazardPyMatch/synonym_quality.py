@@ -0,0 +1,158 @@
+# synonym_quality.py
+
+import os
+import re
+import time
+import pandas as pd
+from synonym_lookup import SYNONYM_PLACEHOLDERS
+
+# Default pruning rules; pass a modified copy to prune_master_list to change them.
+# The length and ambiguity rules never apply to in-list synonyms (the inventory's own names),
+# so abbreviations such as "HCl", "DMF" or "THF" used in the inventory are always matched.
+DEFAULT_SYNONYM_RULES = {
+    "min_length": 3,                # PubChem synonyms shorter than this (e.g. "Ac", "Me") are too ambiguous to match
+    "drop_numeric": True,           # Synonyms made only of digits and punctuation
+    "drop_registry_ids": True,      # CAS/EC numbers, UNIIs, InChIKeys and database identifiers
+    "max_cas_per_synonym": 3,       # PubChem synonyms shared by more CAS Numbers than this are ambiguous
+    "flag_only": (),                # Reasons to report but keep, e.g. ("ambiguous",)
+}
+
+# Database / registry prefixes that PubChem lists as synonyms (e.g. "NSC 85228", "CHEMBL14688", "AI3-01234")
+REGISTRY_PREFIXES = (
+    "AI3", "AKOS", "BDBM", "BRN", "CAS", "CCRIS", "CHEBI", "CHEMBL", "DB", "DSSTOX", "DTXCID", "DTXSID",
+    "EC", "EINECS", "HMS", "HSDB", "KBIO", "MFCD", "MLS", "NCGC", "NSC", "RTECS", "SCHEMBL", "SMR",
+    "UN", "UNII", "WLN", "ZINC",
+)
+
+REGISTRY_ID_PATTERNS = [
+    re.compile(r'^\d{2,7}-\d{2}-\d$'),                         # CAS Number
+    re.compile(r'^\d{3}-\d{3}-\d$'),                           # EC / EINECS Number
+    re.compile(r'^(?=.*\d)[A-Z0-9]{10}$'),                     # FDA UNII
+    re.compile(r'^[A-Z]{14}-[A-Z]{10}-[A-Z]$'),                # InChIKey
+    re.compile(r'^InChI='),                                    # InChI string
+    re.compile(r'^(?:' + '|'.join(REGISTRY_PREFIXES) + r')[\s:_-]?\d[\d\s:_-]*$', re.IGNORECASE),
+]
+
+NUMERIC_PATTERN = re.compile(r'^[\d\s.,:;/()\[\]+-]+$')
+
+
+def synonym_format_issue(synonym, rules=DEFAULT_SYNONYM_RULES, in_list=False):
+    """Returns the reason a synonym fails the format rules, or None if it passes.
+
+    In-list synonyms are exempt from the minimum length rule.
+    """
+    synonym = str(synonym).strip()
+
+    if not synonym or synonym in SYNONYM_PLACEHOLDERS:
+        return "placeholder"
+    if rules.get("drop_registry_ids") and any(pattern.match(synonym) for pattern in REGISTRY_ID_PATTERNS):
+        return "registry_id"
+    if rules.get("drop_numeric") and NUMERIC_PATTERN.match(synonym):
+        return "numeric"
+    if not in_list and len(synonym) < rules.get("min_length", 0):
+        return "too_short"
+    return None
+
+
+def build_ambiguity_index(master_list):
+    """Maps each case-folded synonym to the sorted CAS Numbers that share it."""
+    index = {}
+    for cas_number, synonym, _, _ in master_list:
+        index.setdefault(str(synonym).strip().casefold(), set()).add(cas_number)
+    return {synonym: sorted(map(str, cas_numbers)) for synonym, cas_numbers in index.items()}
+
+
+def score_synonyms(master_list, rules=DEFAULT_SYNONYM_RULES, ambiguity_index=None):
+    """Scores every master list entry and decides whether it is kept, flagged or dropped.
+
+    The score is 0 for synonyms failing a format rule and 1 / (number of CAS Numbers sharing the
+    synonym) otherwise, so unique, well-formed names score 1. In-list synonyms are never dropped
+    for being short or ambiguous.
+    """
+    if ambiguity_index is None:
+        ambiguity_index = build_ambiguity_index(master_list)
+
+    flag_only = set(rules.get("flag_only", ()))
+    max_cas = rules.get("max_cas_per_synonym")
+
+    scored = []
+    for i, (cas_number, synonym, _, _) in enumerate(master_list):
+        in_list = master_list.in_list(i)
+        cas_count = len(ambiguity_index[str(synonym).strip().casefold()])
+        reason = synonym_format_issue(synonym, rules, in_list)
+        if reason is None and max_cas and cas_count > max_cas and not in_list:
+            reason = "ambiguous"
+
+        if reason is None:
+            action = "keep"
+        elif reason in flag_only:
+            action = "flag"
+        else:
+            action = "drop"
+
+        score = 0.0 if reason not in (None, "ambiguous") else 1.0 / cas_count
+        scored.append((cas_number, synonym, in_list, cas_count, round(score, 4), reason, action))
+
+    return pd.DataFrame(scored, columns=['CAS Number', 'Synonym', 'In-List', 'CAS Count', 'Score', 'Reason', 'Action'])
+
+
+def prune_master_list(master_list, rules=DEFAULT_SYNONYM_RULES, source_folder=None):
+    """Drops low-signal synonyms from a CompactMasterList and reports what was removed.
+
+    Returns the pruned master list, the per-synonym quality DataFrame and the ambiguity index.
+    The quality report and ambiguity index are saved as CSV files when source_folder is given.
+    """
+    print("....................Scoring and Pruning Synonyms")
+
+    ambiguity_index = build_ambiguity_index(master_list)
+    df_quality = score_synonyms(master_list, rules, ambiguity_index)
+
+    keep_mask = (df_quality['Action'] != "drop").to_numpy()
+    pruned = master_list.select(keep_mask.nonzero()[0])
+
+    patterns_before = df_quality['Synonym'].nunique()
+    patterns_after = df_quality.loc[keep_mask, 'Synonym'].nunique()
+    print(f"Synonym patterns: {patterns_before} before pruning, {patterns_after} after pruning")
+    for reason, count in df_quality.loc[df_quality['Action'] == "drop", 'Reason'].value_counts().items():
+        print(f"  dropped ({reason}): {count}")
+    flagged = (df_quality['Action'] == "flag").sum()
+    if flagged:
+        print(f"  flagged but kept: {flagged}")
+
+    # A CAS Number without any remaining synonym can never be matched in a protocol
+    lost_cas = sorted(set(map(str, df_quality['CAS Number'])) - set(map(str, df_quality.loc[keep_mask, 'CAS Number'])))
+    if lost_cas:
+        print(f"⚠️ {len(lost_cas)} CAS Numbers lost all of their synonyms to pruning and will not be matched: "
+              f"{', '.join(lost_cas[:20])}{' ...' if len(lost_cas) > 20 else ''}")
+
+    if source_folder:
+        quality_path = os.path.join(source_folder, "synonym_quality_report.csv")
+        df_quality[df_quality['Action'] != "keep"].to_csv(quality_path, index=False)
+        print(f"Synonym quality report saved to: {quality_path}")
+
+        ambiguity_path = os.path.join(source_folder, "synonym_ambiguity_index.csv")
+        pd.DataFrame(
+            [(synonym, len(cas_numbers), ', '.join(cas_numbers))
+             for synonym, cas_numbers in ambiguity_index.items() if len(cas_numbers) > 1],
+            columns=['Synonym', 'CAS Count', 'CAS Numbers'],
+        ).sort_values('CAS Count', ascending=False).to_csv(ambiguity_path, index=False)
+        print(f"Synonym ambiguity index saved to: {ambiguity_path}")
+
+    print("....................Synonym Pruning Complete")
+
+    return pruned, df_quality, ambiguity_index
+
+
+def compare_scan_times(matcher_before, matcher_after, texts):
+    """Times scanning the same texts with the unpruned and pruned matchers."""
+    timings = {}
+    for label, matcher in (("before", matcher_before), ("after", matcher_after)):
+        start = time.perf_counter()
+        for extracted_text in texts:
+            matcher.match(extracted_text)
+        timings[label] = time.perf_counter() - start
+
+    print(f"Scan time for {len(texts)} protocols: {timings['before']:.3f}s before pruning, "
+          f"{timings['after']:.3f}s after pruning "
+          f"({len(matcher_before.patterns)} -> {len(matcher_after.patterns)} patterns)")
+    return timings
@@ -0,0 +1,100 @@
+# text_normalization.py
+
+import unicodedata
+
+# Hyphen variants that PDF text extraction produces for "-"; a hyphen at a line break splits a word
+HYPHENS = set("-\u2010\u2011\ufe63\uff0d")
+SOFT_HYPHEN = "\u00ad"
+MINUS = "\u2212"  # Kept as "-" (e.g. "(\u2212)-menthol") but never joins words across lines
+# Punctuation dashes separate words ("ethanol\u2014methanol") and become a space
+DASHES = set("\u2012\u2013\u2014\u2015\u2043\ufe58")
+
+
+def _normalize_char(ch):
+    """Case-folds one character after compatibility decomposition (ligatures, full-width forms)."""
+    if ch.isascii():
+        return ch.lower()
+    if ch == SOFT_HYPHEN:
+        return ""
+    if ch in HYPHENS or ch == MINUS:
+        return "-"
+    if ch in DASHES:
+        return " "
+    return unicodedata.normalize("NFKC", ch).casefold()
+
+
+def normalize_text(text):
+    """Normalizes text for matching and keeps a map back to the original character offsets.
+
+    - case folding and Unicode compatibility normalization
+    - Unicode hyphens and the minus sign become "-"; en/em and other punctuation dashes become a space
+    - a hyphen or soft hyphen at a line break is removed together with the break ("dimethyl-\\nsulfoxide")
+    - whitespace runs (and dashes) collapse to a single space
+
+    Returns (normalized_text, offsets) where offsets[i] is the index in text of the character that
+    produced normalized_text[i]; offsets has one extra trailing entry equal to len(text).
+    """
+    normalized = []
+    offsets = []
+    i = 0
+    n = len(text)
+
+    while i < n:
+        ch = text[i]
+
+        if ch.isspace():
+            # Collapse the whole whitespace run into one space
+            j = i
+            while j < n and text[j].isspace():
+                j += 1
+            if normalized and normalized[-1] != " ":
+                normalized.append(" ")
+                offsets.append(i)
+            i = j
+            continue
+
+        folded = _normalize_char(ch)
+
+        if ch in HYPHENS or ch == SOFT_HYPHEN:
+            # De-hyphenate words split across lines: drop the hyphen and the line break
+            j = i + 1
+            while j < n and text[j].isspace() and text[j] not in "\r\n":
+                j += 1
+            if j < n and text[j] in "\r\n" and normalized and normalized[-1] != " ":
+                while j < n and text[j].isspace():
+                    j += 1
+                i = j
+                continue
+
+        if folded == " ":
+            # A punctuation dash separates words like whitespace does
+            if normalized and normalized[-1] != " ":
+                normalized.append(" ")
+                offsets.append(i)
+            i += 1
+            continue
+
+        for out in folded:
+            normalized.append(out)
+            offsets.append(i)
+        i += 1
+
+    # Drop a trailing collapsed space so normalized text never ends in whitespace
+    if normalized and normalized[-1] == " ":
+        normalized.pop()
+        offsets.pop()
+
+    offsets.append(n)
+    return "".join(normalized), offsets
+
+
+def normalize_synonym(synonym):
+    """Normalizes a synonym the same way as document text."""
+    return normalize_text(str(synonym).strip())[0]
+
+
+def original_span(offsets, start, end):
+    """Maps a [start, end) span in normalized text back to the original text."""
+    if end <= start:
+        return offsets[start], offsets[start]
+    return offsets[start], offsets[end - 1] + 1
@@ -1,101 +1,189 @@
 # visualization.py
 
-import pandas as pd
-import matplotlib.pyplot as plt
 import os
+import matplotlib
+from concurrent.futures import ProcessPoolExecutor
 
-def plot_ghs_code_distribution(df_inventory, source_folder=None):
-    """Generates a bar chart of GHS Code frequencies in the chemical inventory."""
-    
-    print("....................Generating GHS Code Distribution Plot")
+# Force a non-interactive backend so plotting never needs a display
+matplotlib.use("Agg")
+
+from matplotlib.figure import Figure
+
+DEFAULT_TOP_N = 30
+OTHER_LABEL = "Other"
+
+
+def aggregate_top_n(counts, top_n=DEFAULT_TOP_N, other_label=OTHER_LABEL):
+    """Keeps the top_n largest counts and folds the remainder into a single 'Other' bar."""
+    counts = counts.sort_values(ascending=False)
+
+    if top_n is None or len(counts) <= top_n:
+        return counts
+
+    top_counts = counts.iloc[:top_n].copy()
+    top_counts[other_label] = counts.iloc[top_n:].sum()
+    return top_counts
 
+
+def ghs_code_counts(df_inventory):
+    """Counts occurrences of each GHS code in the chemical inventory."""
     if "GHS Codes" not in df_inventory.columns:
         raise KeyError("The DataFrame must contain a 'GHS Codes' column.")
 
     # Flatten the GHS Codes into a list
-    all_ghs_codes = df_inventory["GHS Codes"].dropna().str.split(" --- ").explode()
+    all_ghs_codes = df_inventory["GHS Codes"].dropna().astype(str).str.split(" --- ").explode()
+    return all_ghs_codes.value_counts()
 
-    # Count occurrences of each GHS code
-    ghs_code_counts = all_ghs_codes.value_counts()
 
-    # Create a bar chart
-    plt.figure(figsize=(10, 6))
-    ghs_code_counts.plot(kind="bar")
-    plt.xlabel("GHS Hazard Code")
-    plt.ylabel("Frequency")
-    plt.title("GHS Hazard Code Distribution in Chemical Inventory")
-    plt.xticks(rotation=45)
-    plt.grid(axis="y", linestyle="--", alpha=0.7)
+def protocol_counts(df_hazards):
+    """Counts the number of hazardous instances per protocol type."""
+    if "Protocol" not in df_hazards.columns:
+        raise KeyError("The DataFrame must contain a 'Protocol' column.")
 
-    # Save or display the plot
-    if source_folder:
-        output_path = os.path.join(source_folder, "GHS_Code_Distribution.png")
-        plt.savefig(output_path, bbox_inches="tight")
-        print(f"GHS Code Distribution Plot saved to: {output_path}")
-    else:
-        plt.show()
+    return df_hazards["Protocol"].value_counts()
 
-    print("....................Visualization Complete")
 
+def cas_counts(df_inventory):
+    """Counts occurrences of each CAS Number in the chemical inventory."""
+    if "CAS Number" not in df_inventory.columns:
+        raise KeyError("The DataFrame must contain a 'CAS Number' column.")
+
+    return df_inventory["CAS Number"].value_counts()
 
-def plot_hazardous_protocols(df_hazards, source_folder=None):
-    """Generates a bar chart of the number of hazardous protocols per protocol type."""
-    
-    print("....................Generating Hazardous Protocols Plot")
 
-    if "Protocol" not in df_hazards.columns:
-        raise KeyError("The DataFrame must contain a 'Protocol' column.")
+def render_bar_chart(labels, values, title, xlabel, ylabel, color=None, rotation=45, output_path=None):
+    """Renders a bar chart on a standalone Agg figure and saves it if output_path is given."""
 
-    # Count the number of hazardous protocols per protocol type
-    protocol_counts = df_hazards["Protocol"].value_counts()
+    # A standalone Figure is not registered with pyplot, so nothing is left open after saving
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    positions = range(len(values))
+    ax.bar(positions, values, color=color)
+    ax.set_xticks(list(positions))
+    ax.set_xticklabels([str(label) for label in labels], rotation=rotation,
+                       ha="right" if rotation not in (0, 90) else "center")
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.grid(axis="y", linestyle="--", alpha=0.7)
 
-    # Create a bar chart
-    plt.figure(figsize=(10, 6))
-    protocol_counts.plot(kind="bar", color="red")
-    plt.xlabel("Protocol Type")
-    plt.ylabel("Number of Hazardous Instances")
-    plt.title("Hazardous Protocols Frequency")
-    plt.xticks(rotation=45)
-    plt.grid(axis="y", linestyle="--", alpha=0.7)
+    if output_path:
+        fig.savefig(output_path, bbox_inches="tight")
+        return output_path
 
-    # Save or display the plot
-    if source_folder:
-        output_path = os.path.join(source_folder, "Hazardous_Protocols.png")
-        plt.savefig(output_path, bbox_inches="tight")
-        print(f"Hazardous Protocols Plot saved to: {output_path}")
+    return fig
+
+
+def render_chart_spec(spec):
+    """Renders one chart spec (a plain dict) - picklable entry point for worker processes."""
+    return render_bar_chart(**spec)
+
+
+def ghs_code_chart(df_inventory, source_folder=None, top_n=DEFAULT_TOP_N):
+    """Builds the chart spec for the GHS Code distribution plot."""
+    counts = aggregate_top_n(ghs_code_counts(df_inventory), top_n)
+    return dict(
+        labels=counts.index.tolist(), values=counts.tolist(),
+        title="GHS Hazard Code Distribution in Chemical Inventory",
+        xlabel="GHS Hazard Code", ylabel="Frequency",
+        output_path=os.path.join(source_folder, "GHS_Code_Distribution.png") if source_folder else None,
+    )
+
+
+def hazardous_protocols_chart(df_hazards, source_folder=None, top_n=DEFAULT_TOP_N):
+    """Builds the chart spec for the hazardous protocols plot."""
+    counts = aggregate_top_n(protocol_counts(df_hazards), top_n)
+    return dict(
+        labels=counts.index.tolist(), values=counts.tolist(),
+        title="Hazardous Protocols Frequency",
+        xlabel="Protocol Type", ylabel="Number of Hazardous Instances", color="red",
+        output_path=os.path.join(source_folder, "Hazardous_Protocols.png") if source_folder else None,
+    )
+
+
+def cas_occurrences_chart(df_inventory, source_folder=None, top_n=DEFAULT_TOP_N):
+    """Builds the chart spec for the CAS Number occurrences plot."""
+    counts = aggregate_top_n(cas_counts(df_inventory), top_n)
+    title = "CAS Number Occurrences in Inventory"
+    if top_n is not None and len(counts) > top_n:
+        title += f" (top {top_n})"
+    return dict(
+        labels=counts.index.tolist(), values=counts.tolist(),
+        title=title, xlabel="CAS Number", ylabel="Occurrences", color="blue", rotation=90,
+        output_path=os.path.join(source_folder, "CAS_Number_Occurrences.png") if source_folder else None,
+    )
+
+
+def chart_specs(df_inventory, df_hazards=None, source_folder=None, top_n=DEFAULT_TOP_N):
+    """Builds the chart specs for all standard report plots."""
+    specs = [ghs_code_chart(df_inventory, source_folder, top_n)]
+    if df_hazards is not None:
+        specs.append(hazardous_protocols_chart(df_hazards, source_folder, top_n))
+    specs.append(cas_occurrences_chart(df_inventory, source_folder, top_n))
+    return specs
+
+
+def render_plots(df_inventory, df_hazards=None, source_folder=None, top_n=DEFAULT_TOP_N, max_workers=None):
+    """Renders all report plots in parallel worker processes and returns their output paths."""
+
+    print("....................Rendering Report Plots")
+
+    # Aggregation happens here, so workers only receive at most top_n + 1 bars per chart
+    specs = chart_specs(df_inventory, df_hazards, source_folder=source_folder, top_n=top_n)
+
+    if not source_folder:
+        return [render_chart_spec(spec) for spec in specs]
+
+    if max_workers == 1:
+        results = [render_chart_spec(spec) for spec in specs]
     else:
-        plt.show()
+        with ProcessPoolExecutor(max_workers=max_workers or len(specs)) as executor:
+            results = list(executor.map(render_chart_spec, specs))
+
+    for path in results:
+        print(f"Plot saved to: {path}")
 
     print("....................Visualization Complete")
+    return results
 
 
-def plot_cas_occurrences(df_inventory, source_folder=None):
-    """Generates a histogram showing occurrences of unique CAS Numbers."""
-    
-    print("....................Generating CAS Number Occurrences Plot")
+def plot_ghs_code_distribution(df_inventory, source_folder=None, top_n=DEFAULT_TOP_N):
+    """Generates a bar chart of GHS Code frequencies in the chemical inventory."""
 
-    if "CAS Number" not in df_inventory.columns:
-        raise KeyError("The DataFrame must contain a 'CAS Number' column.")
+    print("....................Generating GHS Code Distribution Plot")
 
-    # Count occurrences of each CAS number
-    cas_counts = df_inventory["CAS Number"].value_counts()
+    # Save the plot, or return the figure for display when no folder is given
+    result = render_chart_spec(ghs_code_chart(df_inventory, source_folder, top_n))
+    if source_folder:
+        print(f"GHS Code Distribution Plot saved to: {result}")
 
-    # Create a histogram
-    plt.figure(figsize=(10, 6))
-    cas_counts.plot(kind="bar", color="blue")
-    plt.xlabel("CAS Number")
-    plt.ylabel("Occurrences")
-    plt.title("CAS Number Occurrences in Inventory")
-    plt.xticks(rotation=90)
-    plt.grid(axis="y", linestyle="--", alpha=0.7)
+    print("....................Visualization Complete")
+    return result
+
+
+def plot_hazardous_protocols(df_hazards, source_folder=None, top_n=DEFAULT_TOP_N):
+    """Generates a bar chart of the number of hazardous protocols per protocol type."""
 
-    # Save or display the plot
+    print("....................Generating Hazardous Protocols Plot")
+
+    # Save the plot, or return the figure for display when no folder is given
+    result = render_chart_spec(hazardous_protocols_chart(df_hazards, source_folder, top_n))
     if source_folder:
-        output_path = os.path.join(source_folder, "CAS_Number_Occurrences.png")
-        plt.savefig(output_path, bbox_inches="tight")
-        print(f"CAS Number Occurrences Plot saved to: {output_path}")
-    else:
-        plt.show()
+        print(f"Hazardous Protocols Plot saved to: {result}")
 
     print("....................Visualization Complete")
+    return result
 
+
+def plot_cas_occurrences(df_inventory, source_folder=None, top_n=DEFAULT_TOP_N):
+    """Generates a bar chart of the most frequent CAS Numbers, with the rest grouped as 'Other'."""
+
+    print("....................Generating CAS Number Occurrences Plot")
+
+    # Save the plot, or return the figure for display when no folder is given
+    result = render_chart_spec(cas_occurrences_chart(df_inventory, source_folder, top_n))
+    if source_folder:
+        print(f"CAS Number Occurrences Plot saved to: {result}")
+
+    print("....................Visualization Complete")
+    return result
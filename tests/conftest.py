@@ -0,0 +1,7 @@
+# conftest.py
+
+import os
+import sys
+
+# The pipeline modules import each other by bare module name, as when run from HazardPyMatch/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'HazardPyMatch'))
@@ -0,0 +1,66 @@
+# test_checkpoint.py
+
+import os
+import pytest
+from checkpoint import StageCheckpoint, open_checkpoint, run_checkpointed, clear_checkpoints
+
+
+def lookup(calls, value):
+    calls.append(value)
+    return {'value': value} if value != "bad" else None
+
+
+def test_rerun_resumes_from_checkpoint(tmp_path):
+    folder = str(tmp_path / "checkpoints")
+    calls = []
+    checkpoint = open_checkpoint(folder, "ghs", every=2)
+    for key in ["a", "b", "c"]:
+        run_checkpointed(checkpoint, key, lookup, calls, key)
+    # Interrupted before "c" was flushed: only the first full batch is on disk
+    resumed = StageCheckpoint(folder, "ghs", every=2)
+    assert len(resumed) == 2 and "c" not in resumed
+
+    calls.clear()
+    results = [run_checkpointed(resumed, key, lookup, calls, key) for key in ["a", "b", "c"]]
+    assert results == [{'value': "a"}, {'value': "b"}, {'value': "c"}]
+    assert calls == ["c"]
+
+
+def test_rejected_results_and_exceptions_are_not_checkpointed(tmp_path):
+    checkpoint = open_checkpoint(str(tmp_path), "cas", every=1)
+    calls = []
+    assert run_checkpointed(checkpoint, "bad", lookup, calls, "bad", keep_result=lambda r: r is not None) is None
+    assert "bad" not in checkpoint
+
+    def failing_lookup():
+        raise TimeoutError("rate limited")
+
+    with pytest.raises(TimeoutError):
+        run_checkpointed(checkpoint, "slow", failing_lookup)
+    assert "slow" not in checkpoint
+    assert len(StageCheckpoint(str(tmp_path), "cas")) == 0
+
+
+def test_flush_replaces_checkpoint_atomically(tmp_path, monkeypatch):
+    checkpoint = StageCheckpoint(str(tmp_path), "synonyms", every=1)
+    checkpoint.record("a", ["alpha"])
+    assert not os.path.exists(f"{checkpoint.path}.tmp")
+
+    # A crash while writing the new file leaves the previous checkpoint untouched
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(OSError):
+        checkpoint.record("b", ["beta"])
+    monkeypatch.undo()
+    assert StageCheckpoint(str(tmp_path), "synonyms").results == {"a": ["alpha"]}
+
+
+def test_clear_checkpoints_removes_the_folder(tmp_path):
+    folder = str(tmp_path / "checkpoints")
+    StageCheckpoint(folder, "ghs", every=1).record("a", 1)
+    clear_checkpoints(folder)
+    assert not os.path.exists(folder)
+    assert open_checkpoint(None, "ghs") is None
+    clear_checkpoints(folder)  # Nothing left to clear
@@ -0,0 +1,65 @@
+# test_hazard_index.py
+
+import pandas as pd
+import pytest
+from hazard_index import HazardIndex, hcode_parts, expand_hcode
+
+
+def detail(cas_number):
+    return {'CAS Number': cas_number, 'PubChem_ID': None, 'GHS_Codes': None}
+
+
+@pytest.fixture
+def index():
+    df_inventory = pd.DataFrame({
+        'CAS Number': ["68-12-2", "1-1-1", "2-2-2", "71-43-2"],
+        'PubChem ID': [6228, 1, 2, 241],
+        'GHS Codes': ["H360D", "H360FD --- H302", "H360F", "H350"],
+    })
+    results = [
+        ("P2.pdf", ("P2", "source"), [detail("1-1-1")]),
+        ("P1.pdf", ("P1", "source"), [detail("68-12-2"), detail("71-43-2")]),
+        ("P3.pdf", ("P3", "source"), [detail("2-2-2")]),
+        ("P4.pdf", ("P4", "source"), []),
+    ]
+    return HazardIndex.build(df_inventory, results)
+
+
+def test_hcode_parts():
+    assert hcode_parts("H360FD") == ["H360F", "H360D"]
+    assert hcode_parts("H360") == ["H360"]
+    assert expand_hcode("H360FD") == ["H360", "H360F", "H360D"]
+
+
+def test_combined_codes_are_split(index):
+    assert index.protocols_with_hcode("H360")['Filename'].tolist() == ["P1.pdf", "P2.pdf", "P3.pdf"]
+    assert index.protocols_with_hcode("H360D")['Filename'].tolist() == ["P1.pdf", "P2.pdf"]
+    assert index.protocols_with_hcode("h360fd")['Filename'].tolist() == ["P2.pdf"]
+    assert index.protocols_with_hcode("H361").empty
+
+    summary = index.cas_summary.set_index('CAS Number')
+    assert summary.loc["1-1-1", 'H-Code Count'] == 2
+    assert summary.loc["1-1-1", ['H360', 'H360F', 'H360D', 'H302']].tolist() == [1, 1, 1, 1]
+
+
+def test_queries(index):
+    assert index.top_protocols(1)['Filename'].tolist() == ["P1.pdf"]
+    assert index.chemicals_in_protocol("P1.pdf")['CAS Number'].tolist() == ["68-12-2", "71-43-2"]
+    assert index.protocols_for_cas("2-2-2")['Filename'].tolist() == ["P3.pdf"]
+    assert index.hcode_protocol_counts()['H360'] == 3
+
+
+def test_unknown_keys_return_empty_frames(index):
+    missing_protocol = index.chemicals_in_protocol("missing.pdf")
+    assert missing_protocol.empty
+    assert list(missing_protocol.columns) == list(index.cas_summary.columns)
+    missing_cas = index.protocols_for_cas("0-00-0")
+    assert missing_cas.empty
+    assert list(missing_cas.columns) == list(index.protocols.columns)
+
+
+def test_save_and_load_round_trip(tmp_path, index):
+    loaded = HazardIndex.load(index.save(str(tmp_path / "hazard_index")))
+    pd.testing.assert_frame_equal(loaded.protocols, index.protocols)
+    pd.testing.assert_frame_equal(loaded.cas_summary, index.cas_summary)
+    assert loaded.protocols_with_hcode("H360FD")['Filename'].tolist() == ["P2.pdf"]
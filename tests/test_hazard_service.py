@@ -0,0 +1,152 @@
+# test_hazard_service.py
+
+import json
+import threading
+import urllib.error
+import urllib.request
+import pandas as pd
+import pytest
+from hazard_service import HazardService, FakePubChemLookup, make_server
+
+RELEVANT_GHS_CODES = ["H301", "H314", "H350", "H360D"]
+
+
+@pytest.fixture
+def inventory():
+    return pd.DataFrame({
+        'Chemical Name': ["Methanol", "HCl", "DMF", "THF"],
+        'CAS Number': ["67-56-1", "7647-01-0", "68-12-2", "109-99-9"],
+        'PubChem ID': [887, 313, 6228, 8028],
+        'GHS Codes': ["H225 --- H301", "H314", "H360D", "H225"],
+        'In-List Synonym 1': ["Methanol", "HCl", "DMF", "THF"],
+        'PubChem Synonym 1': ["Methyl alcohol", "Hydrochloric acid", "Dimethylformamide", "Tetrahydrofuran"],
+    })
+
+
+@pytest.fixture
+def lookup():
+    return FakePubChemLookup({
+        "71-43-2": {"names": ["Benzene", "Benzol"], "pubchem_id": 241, "ghs_codes": "H225 --- H350"},
+        "64-17-5": {"names": ["Ethanol"], "pubchem_id": 702, "ghs_codes": "H225"},
+    })
+
+
+@pytest.fixture
+def server(inventory, lookup):
+    service = HazardService(inventory, RELEVANT_GHS_CODES, lookup=lookup)
+    httpd = make_server(service, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", service
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def request(url, data=None, content_type='text/plain'):
+    """Returns (status, JSON payload), including for error responses."""
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': content_type} if data else {})
+    try:
+        with urllib.request.urlopen(req) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_check_cas_in_inventory_needs_no_lookup(server, lookup):
+    url, _ = server
+    status, payload = request(f"{url}/check?cas=67-56-1")
+    assert status == 200
+    assert payload['in_inventory'] and payload['hazardous']
+    assert payload['relevant_ghs_codes'] == ["H301"]
+    assert lookup.calls == 0
+
+
+def test_check_cas_outside_inventory_is_cached(server, lookup):
+    url, service = server
+    status, payload = request(f"{url}/check?cas=71-43-2")
+    assert status == 200
+    assert payload['hazardous'] and not payload['in_inventory']
+    calls = lookup.calls
+
+    status, payload = request(f"{url}/check?cas=71-43-2")
+    assert status == 200 and payload['hazardous']
+    assert lookup.calls == calls
+    assert "71-43-2" in service.cas_cache
+
+
+def test_failed_lookup_is_unknown_and_not_cached(server, lookup):
+    url, service = server
+    lookup.unavailable = True
+    status, payload = request(f"{url}/check?cas=71-43-2")
+    assert status == 502
+    assert payload['status'] == "unknown" and payload['hazardous'] is None
+    assert "71-43-2" not in service.cas_cache
+
+    status, payload = request(f"{url}/check?name=Benzol")
+    assert status == 502 and payload['hazardous'] is None
+    assert "benzol" not in service.name_cache
+
+    # Once PubChem is back the same requests are answered and cached
+    lookup.unavailable = False
+    status, payload = request(f"{url}/check?cas=71-43-2")
+    assert status == 200 and payload['hazardous'] is True
+    assert "71-43-2" in service.cas_cache
+    assert request(f"{url}/stats")[1]['lookup_errors'] == 2
+
+
+def test_check_name_resolves_inventory_synonyms(server, lookup):
+    url, _ = server
+    status, payload = request(f"{url}/check?name=methyl%20ALCOHOL")
+    assert status == 200
+    assert [match['cas_number'] for match in payload['matches']] == ["67-56-1"]
+    assert payload['hazardous']
+    assert lookup.calls == 0
+
+
+def test_scan_matches_short_inventory_names(server):
+    url, _ = server
+    status, payload = request(f"{url}/scan?filename=P1_src.pdf", b"Add 5 mL HCl and DMF, then THF.")
+    assert status == 200
+    assert payload['protocol'] == "P1"
+    assert payload['hazards'] == ["7647-01-0", "68-12-2", "109-99-9"]
+    assert [detail['Synonym'] for detail in payload['matched_details']] == ["HCl", "DMF", "THF"]
+
+
+def test_refresh_adds_new_chemicals_to_the_matcher(server, lookup):
+    url, _ = server
+    assert request(f"{url}/scan", b"Dissolve in benzol.")[1]['hazards'] == []
+
+    chemicals = {'chemicals': [
+        {'Chemical Name': "Benzene", 'CAS Number': "71-43-2"},
+        {'Chemical Name': "Ethanol", 'CAS Number': "64-17-5"},
+        {'Chemical Name': "Methanol", 'CAS Number': "67-56-1"},
+    ]}
+    status, payload = request(f"{url}/refresh", json.dumps(chemicals).encode('utf-8'), 'application/json')
+    assert status == 200
+    assert payload['added'] == ["71-43-2"]
+    assert payload['not_relevant'] == ["64-17-5"]
+    assert payload['already_known'] == ["67-56-1"]
+
+    assert request(f"{url}/scan", b"Dissolve in Benzol.")[1]['hazards'] == ["71-43-2"]
+    status, payload = request(f"{url}/check?name=benzol")
+    assert status == 200 and payload['hazardous']
+
+
+def test_refresh_during_outage_is_retried(server, lookup):
+    url, _ = server
+    body = json.dumps({'chemicals': [{'Chemical Name': "Benzene", 'CAS Number': "71-43-2"}]}).encode('utf-8')
+
+    lookup.unavailable = True
+    status, payload = request(f"{url}/refresh", body, 'application/json')
+    assert status == 200
+    assert payload['added'] == [] and [failure['chemical'] for failure in payload['failed']] == ["71-43-2"]
+
+    lookup.unavailable = False
+    assert request(f"{url}/refresh", body, 'application/json')[1]['added'] == ["71-43-2"]
+
+
+def test_unknown_endpoint_and_bad_request(server):
+    url, _ = server
+    assert request(f"{url}/nope")[0] == 404
+    assert request(f"{url}/check")[0] == 400
+    assert request(f"{url}/health") == (200, {'status': 'ok'})
@@ -0,0 +1,35 @@
+# test_master_list.py
+
+import os
+import pandas as pd
+from master_list import CompactMasterList
+
+
+def inventory(n_rows):
+    return pd.DataFrame({
+        'Chemical Name': [f"Chemical {i}" for i in range(n_rows)],
+        'CAS Number': [f"{i + 50}-00-{i % 10}" for i in range(n_rows)],
+        'PubChem ID': range(n_rows),
+        'GHS Codes': ["H225 --- H301"] * n_rows,
+        'In-List Synonym 1': [f"Chemical {i}" for i in range(n_rows)],
+        'PubChem Synonym 1': [f"Synonym {i}" for i in range(n_rows)],
+    })
+
+
+def test_save_load_round_trip(tmp_path):
+    master_list = CompactMasterList.from_inventory(inventory(20))
+    loaded = CompactMasterList.load(master_list.save(str(tmp_path / "master_list")))
+    assert list(loaded) == list(master_list)
+    assert loaded.in_list(0) and not loaded.in_list(1)
+
+
+def test_resave_does_not_change_mapped_lists(tmp_path):
+    folder = str(tmp_path / "master_list")
+    CompactMasterList.from_inventory(inventory(200)).save(folder)
+    mapped = CompactMasterList.load(folder)
+
+    CompactMasterList.from_inventory(inventory(50)).save(folder)
+
+    assert len(mapped) == 400 and mapped.synonym(399) == "Synonym 199"
+    assert len(CompactMasterList.load(folder)) == 100
+    assert len([entry for entry in os.listdir(folder) if entry.startswith('v')]) == 1
@@ -0,0 +1,78 @@
+# test_protocol_matcher.py
+
+import re
+import random
+import pandas as pd
+import pytest
+from protocol_matcher import SynonymMatcher
+from text_normalization import normalize_text, normalize_synonym, original_span
+
+WORDS = ["methyl", "Ethyl", "acid", "2", "1,3", "N", "di", "oxane", "(", ")", "-", "ß", "é", "sulf", "ide", "Acetic", "ol"]
+SEPARATORS = [" ", "  ", "-", "-\n", "\n", ", ", "—", "", ".", "(", "x"]
+
+
+def master_list(synonyms):
+    return pd.DataFrame(
+        [(f"{i}-00-1", synonym, i, "H225") for i, synonym in enumerate(synonyms)],
+        columns=['CAS_Number', 'Synonym', 'PubChem_ID', 'GHS_Codes'],
+    )
+
+
+def reference_spans(synonyms, text, mode):
+    """First whole-word hit of every synonym, found with one regex search per synonym."""
+    search_text, offsets = normalize_text(text) if mode == "normalized" else (text, None)
+    spans = []
+    for i, synonym in enumerate(synonyms):
+        if mode == "normalized":
+            pattern = r'\b' + re.escape(normalize_synonym(synonym)).replace(r'\-', '-?') + r'\b'
+        else:
+            pattern = fr'\b{re.escape(synonym)}\b'
+        hit = re.search(pattern, search_text)
+        if hit:
+            span = hit.span() if offsets is None else original_span(offsets, *hit.span())
+            spans.append((f"{i}-00-1", synonym) + span)
+    return spans
+
+
+@pytest.mark.parametrize("mode", ["exact", "normalized"])
+def test_indexed_search_equals_regex_search(mode):
+    rng = random.Random(7)
+    synonyms = sorted({
+        "".join(rng.choice(WORDS) + rng.choice(["", " ", "-", ","]) for _ in range(rng.randint(1, 4))).strip() or "x"
+        for _ in range(300)
+    })
+    matcher = SynonymMatcher(master_list(synonyms), mode=mode)
+
+    hits = 0
+    for _ in range(200):
+        text = "".join(
+            rng.choice([rng.choice(synonyms), rng.choice(WORDS), rng.choice(WORDS).upper()]) + rng.choice(SEPARATORS)
+            for _ in range(rng.randint(1, 20))
+        )
+        expected = reference_spans(synonyms, text, mode)
+        assert [(entry[0], entry[1], start, end) for entry, start, end in matcher.match_spans(text)] == expected
+        hits += len(expected)
+    assert hits > 1000
+
+
+def test_multi_word_and_punctuated_synonyms():
+    synonyms = ["Acetic acid", "N,N-Dimethylformamide", "Sodium chloride", "Sodium", "(-)-Menthol"]
+    matcher = SynonymMatcher(master_list(synonyms))
+    text = "Add Sodium chloride and N,N-Dimethylformamide to Acetic  acid, then x(-)-Menthol."
+    assert [entry[1] for entry in matcher.match(text)] == ["N,N-Dimethylformamide", "Sodium chloride", "Sodium", "(-)-Menthol"]
+
+
+def test_normalized_hyphens_are_optional():
+    matcher = SynonymMatcher(master_list(["Dimethyl-sulfoxide", "Tetrahydrofuran"]), mode="normalized")
+    text = "Dissolve in DIMETHYLSULFOXIDE, dimethyl-\nsulfoxide or tetra-\nhydrofuran."
+    assert [(entry[1], text[start:end]) for entry, start, end in matcher.match_spans(text)] == [
+        ("Dimethyl-sulfoxide", "DIMETHYLSULFOXIDE"), ("Tetrahydrofuran", "tetra-\nhydrofuran"),
+    ]
+
+
+def test_extend_and_copy_keep_matchers_independent():
+    matcher = SynonymMatcher(master_list(["Methanol"]))
+    extended = matcher.copy()
+    extended.extend(master_list(["Benzol"]))
+    assert [entry[1] for entry in extended.match("Methanol and Benzol")] == ["Methanol", "Benzol"]
+    assert [entry[1] for entry in matcher.match("Methanol and Benzol")] == ["Methanol"]
@@ -0,0 +1,112 @@
+# test_protocol_sharding.py
+
+import os
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
+import numpy as np
+import pandas as pd
+import pytest
+from protocol_matcher import match_hazards_in_protocols
+from protocol_sharding import (match_hazards_sharded, match_hazards_with_queue, partition_protocols, default_shard_count,
+                               _claim_next_task, requeue_stale_claims)
+from hazard_index import HazardIndex, HAZARD_INDEX_FOLDER
+
+PROTOCOL_TEXTS = [
+    "Dissolve the pellet in Methanol and wash twice.",
+    "Add 5 mL HCl, then neutralize.",
+    "Extract with Tetrahydrofuran and dry under nitrogen.",
+    "Incubate at 37 C for one hour.",
+    "Resuspend in DMF with Methyl alcohol.",
+    "Mix Benzene and HCl carefully.",
+    "Rinse with water.",
+]
+
+
+@pytest.fixture
+def inventory():
+    return pd.DataFrame({
+        'Chemical Name': ["Methanol", "HCl", "THF", "DMF", "Benzene"],
+        'CAS Number': ["67-56-1", "7647-01-0", "109-99-9", "68-12-2", "71-43-2"],
+        'PubChem ID': [887, 313, 8028, 6228, 241],
+        'GHS Codes': ["H225 --- H301", "H314", "H225", "H360D", "H350"],
+        'In-List Synonym 1': ["Methanol", "HCl", "THF", "DMF", "Benzene"],
+        'PubChem Synonym 1': ["Methyl alcohol", "Hydrochloric acid", "Tetrahydrofuran", "Dimethylformamide", "Benzol"],
+    })
+
+
+@pytest.fixture
+def protocols_folder(tmp_path):
+    folder = tmp_path / "protocols"
+    folder.mkdir()
+    for i, text in enumerate(PROTOCOL_TEXTS):
+        figure = Figure()
+        figure.text(0.05, 0.5, text)
+        figure.savefig(folder / f"P{i:02d}_source{i}.pdf")
+    return str(folder)
+
+
+def output_folder(tmp_path, name):
+    folder = tmp_path / name
+    folder.mkdir()
+    return str(folder)
+
+
+def assert_same_hazard_index(folder_a, folder_b):
+    index_a = HazardIndex.load(os.path.join(folder_a, HAZARD_INDEX_FOLDER))
+    index_b = HazardIndex.load(os.path.join(folder_b, HAZARD_INDEX_FOLDER))
+    pd.testing.assert_frame_equal(index_a.protocols, index_b.protocols)
+    pd.testing.assert_frame_equal(index_a.cas_summary, index_b.cas_summary)
+    np.testing.assert_array_equal(index_a.protocol_ids, index_b.protocol_ids)
+    np.testing.assert_array_equal(index_a.cas_ids, index_b.cas_ids)
+
+
+def test_partition_is_stable_and_complete():
+    filenames = [f"P{i:03d}.pdf" for i in range(50)]
+    shards = partition_protocols(filenames, 4)
+    assert sorted(f for shard in shards for f in shard) == filenames
+    assert shards == partition_protocols(list(reversed(filenames)), 4)
+    assert default_shard_count(100000, 4) == 500
+    assert default_shard_count(10, 4) == 4
+
+
+def test_old_task_is_not_requeued_once_claimed(tmp_path):
+    queue_folder = tmp_path / "queue"
+    for subfolder in ('tasks', 'claimed', 'results'):
+        (queue_folder / subfolder).mkdir(parents=True)
+    task_path = queue_folder / "tasks" / "shard_00000.json"
+    task_path.write_text('{"shard_id": 0}')
+    os.utime(task_path, (0, 0))  # Task written long before any worker started
+
+    claimed_path = _claim_next_task(str(queue_folder), "worker-1")
+    assert requeue_stale_claims(str(queue_folder), stale_after=60) == 0
+    assert os.path.exists(claimed_path)
+    assert _claim_next_task(str(queue_folder), "worker-2") is None
+
+
+@pytest.mark.parametrize("n_workers", [2, 3])
+def test_sharded_and_queued_scans_match_sequential(tmp_path, inventory, protocols_folder, n_workers):
+    sequential_folder = output_folder(tmp_path, "sequential")
+    df_hazards, df_details = match_hazards_in_protocols(inventory.copy(), protocols_folder, sequential_folder)
+    assert df_hazards['Hazards'].tolist() == [
+        "67-56-1", "7647-01-0", "109-99-9", "N/A", "67-56-1, 68-12-2", "7647-01-0, 71-43-2", "N/A",
+    ]
+    first_hit = df_details.iloc[0]
+    assert (first_hit['Synonym'], first_hit['Match Start'], first_hit['Match End']) == ("Methanol", 23, 31)
+
+    sharded_folder = output_folder(tmp_path, "sharded")
+    df_hazards_sharded, df_details_sharded = match_hazards_sharded(
+        inventory.copy(), protocols_folder, sharded_folder, n_workers=n_workers, n_shards=n_workers + 1
+    )
+    pd.testing.assert_frame_equal(df_hazards, df_hazards_sharded)
+    pd.testing.assert_frame_equal(df_details, df_details_sharded)
+    assert_same_hazard_index(sequential_folder, sharded_folder)
+
+    queue_output_folder = output_folder(tmp_path, "queued")
+    df_hazards_queued, df_details_queued = match_hazards_with_queue(
+        inventory.copy(), protocols_folder, queue_output_folder, str(tmp_path / "queue"), n_shards=4,
+        n_local_workers=n_workers, timeout=60
+    )
+    pd.testing.assert_frame_equal(df_hazards, df_hazards_queued)
+    pd.testing.assert_frame_equal(df_details, df_details_queued)
+    assert_same_hazard_index(sequential_folder, queue_output_folder)
@@ -0,0 +1,81 @@
+# test_text_normalization.py
+
+import pandas as pd
+import pytest
+from text_normalization import normalize_text, normalize_synonym, original_span
+from protocol_matcher import SynonymMatcher
+
+
+def normalized_span(text, needle):
+    """Maps the first occurrence of needle in the normalized text back to the original text."""
+    normalized, offsets = normalize_text(text)
+    start = normalized.index(needle)
+    start, end = original_span(offsets, start, start + len(needle))
+    return text[start:end]
+
+
+def test_hyphen_at_line_break_joins_the_word():
+    text = "Add dimethyl-\nsulfoxide now"
+    normalized, offsets = normalize_text(text)
+    assert normalized == "add dimethylsulfoxide now"
+    assert len(offsets) == len(normalized) + 1 and offsets[-1] == len(text)
+    assert normalized_span(text, "dimethylsulfoxide") == "dimethyl-\nsulfoxide"
+
+
+def test_hyphen_inside_a_line_is_kept():
+    assert normalize_text("N,N-Dimethyl formamide")[0] == "n,n-dimethyl formamide"
+
+
+def test_em_dash_separates_words():
+    assert normalize_text("ethanol—methanol")[0] == "ethanol methanol"
+    assert normalize_text("ethanol—\nmethanol")[0] == "ethanol methanol"
+    assert normalize_text("ethanol – methanol")[0] == "ethanol methanol"
+
+
+def test_soft_hyphen_and_unicode_hyphens():
+    assert normalize_text("metha­\nnol")[0] == "methanol"
+    assert normalize_text("metha­nol")[0] == "methanol"
+    assert normalize_text("1,4‐dioxane")[0] == "1,4-dioxane"
+    assert normalize_text("(−)-menthol")[0] == "(-)-menthol"
+
+
+def test_expanding_characters_map_back_to_one_source_character():
+    text = "Straße sulﬁde"  # sharp s and the "fi" ligature each expand to two characters
+    normalized, offsets = normalize_text(text)
+    assert normalized == "strasse sulfide"
+    assert offsets[4] == offsets[5] == 4
+    assert normalized_span(text, "strasse") == "Straße"
+    assert normalized_span(text, "sulfide") == "sulﬁde"
+    assert normalized_span(text, "ss") == "ß"
+
+
+def test_whitespace_collapses_and_is_trimmed():
+    text = "  Acetic \t\n  acid  "
+    normalized, offsets = normalize_text(text)
+    assert normalized == "acetic acid"
+    assert offsets[0] == 2 and offsets[-1] == len(text)
+
+
+def test_empty_span_maps_to_a_position():
+    _, offsets = normalize_text("abc def")
+    assert original_span(offsets, 2, 2) == (2, 2)
+
+
+def test_normalize_synonym_matches_text_normalization():
+    assert normalize_synonym("  Dimethyl‐Sulfoxide ") == "dimethyl-sulfoxide"
+
+
+@pytest.mark.parametrize("text, synonym, source", [
+    ("Add DIMETHYL-\nSULFOXIDE to the pellet.", "Dimethyl-sulfoxide", "DIMETHYL-\nSULFOXIDE"),
+    ("Wash with ethanol—then dry.", "Ethanol", "ethanol"),
+    ("Dilute in  Straße   reagent.", "Strasse reagent", "Straße   reagent"),
+    ("Add sodium sulﬁde.", "Sodium sulfide", "sodium sulﬁde"),
+])
+def test_normalized_matches_point_at_the_source_text(text, synonym, source):
+    matcher = SynonymMatcher(
+        pd.DataFrame([("1-1-1", synonym, 1, "H225")], columns=['CAS_Number', 'Synonym', 'PubChem_ID', 'GHS_Codes']),
+        mode="normalized",
+    )
+    [(entry, start, end)] = matcher.match_spans(text)
+    assert entry[1] == synonym
+    assert text[start:end] == source